@@ -0,0 +1,157 @@
+import java.io.*;
+import java.lang.reflect.InvocationTargetException;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Paths;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.List;
+import javax.tools.JavaCompiler;
+import javax.tools.ToolProvider;
+
+// JVM server of warm_workers. Requests, one per line on stdin:
+//   COMPILE <output limit> <kill limit> <dir> <file> [javac flags...]
+//   RUN <output limit> <kill limit> <dir> <class> <timeout ms>
+public class SftJvmServer {
+    // Head + tail window of one stream, like the runner's OutputWindow
+    static final class Window extends OutputStream {
+        private final ByteArrayOutputStream head = new ByteArrayOutputStream();
+        private byte[] tail = new byte[0];
+        private int limit;
+        private long total;
+
+        synchronized void reset(int limit) {
+            head.reset();
+            this.limit = limit;
+            if (tail.length != limit - limit / 2) {
+                tail = new byte[limit - limit / 2];
+            }
+            total = 0;
+        }
+
+        synchronized long total() {
+            return total;
+        }
+
+        @Override
+        public synchronized void write(int b) {
+            write(new byte[] {(byte) b}, 0, 1);
+        }
+
+        @Override
+        public synchronized void write(byte[] b, int off, int len) {
+            int room = limit > 0 ? (int) Math.max(0, Math.min(len, limit / 2 - total)) : len;
+            head.write(b, off, room);
+            for (int i = room; i < len; i++) {
+                // Bytes past the head go round the tail buffer
+                tail[(int) ((total + i - limit / 2) % tail.length)] = b[off + i];
+            }
+            total += len;
+        }
+
+        synchronized byte[] toByteArray() {
+            ByteArrayOutputStream result = new ByteArrayOutputStream();
+            result.write(head.toByteArray(), 0, head.size());
+            if (limit <= 0 || total <= limit) {
+                result.write(tail, 0, (int) Math.max(0, Math.min(tail.length, total - limit / 2)));
+                return result.toByteArray();
+            }
+            byte[] note = ("\n... [" + (total - limit) + " bytes truncated] ...\n")
+                .getBytes(StandardCharsets.UTF_8);
+            result.write(note, 0, note.length);
+            int start = (int) ((total - limit / 2) % tail.length);
+            result.write(tail, start, tail.length - start);
+            result.write(tail, 0, start);
+            return result.toByteArray();
+        }
+    }
+
+    static final Window out = new Window();
+    static final Window err = new Window();
+
+    public static void main(String[] args) throws Exception {
+        BufferedReader requests = new BufferedReader(
+            new InputStreamReader(new FileInputStream(FileDescriptor.in), StandardCharsets.UTF_8));
+        OutputStream protocol = new BufferedOutputStream(new FileOutputStream(FileDescriptor.out));
+        System.setIn(new ByteArrayInputStream(new byte[0]));
+        System.setOut(new PrintStream(out, true, "UTF-8"));
+        System.setErr(new PrintStream(err, true, "UTF-8"));
+        JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+
+        String line;
+        while ((line = requests.readLine()) != null) {
+            String[] request = line.split("\t");
+            int limit = Integer.parseInt(request[1]);
+            out.reset(limit);
+            err.reset(limit);
+            String status = request[0].equals("COMPILE")
+                ? compile(compiler, request, err)
+                : run(request[3], request[4], Long.parseLong(request[5]), Long.parseLong(request[2]));
+            System.out.flush();
+            System.err.flush();
+            byte[] stdout = out.toByteArray();
+            byte[] stderr = err.toByteArray();
+            protocol.write((status + "\t" + (stdout.length + stderr.length) + "\n")
+                .getBytes(StandardCharsets.UTF_8));
+            protocol.write(stdout);
+            protocol.write(stderr);
+            protocol.flush();
+            if (status.equals("TIMEOUT") || status.equals("KILLED")) {
+                // A runaway solution thread cannot be stopped safely
+                Runtime.getRuntime().halt(0);
+            }
+        }
+        Runtime.getRuntime().halt(0);
+    }
+
+    static String compile(JavaCompiler compiler, String[] request, OutputStream diagnostics) {
+        if (compiler == null) {
+            return "UNAVAILABLE";
+        }
+        List<String> options = new ArrayList<>(Arrays.asList(request).subList(5, request.length));
+        options.add("-d");
+        options.add(request[3]);
+        options.add(Paths.get(request[3], request[4]).toString());
+        int code = compiler.run(null, null, diagnostics, options.toArray(new String[0]));
+        return code == 0 ? "OK" : "COMPILE ERROR";
+    }
+
+    static String run(String dir, String className, long timeoutMillis, long killLimit) throws Exception {
+        URLClassLoader loader = new URLClassLoader(
+            new URL[] {Paths.get(dir).toUri().toURL()}, ClassLoader.getPlatformClassLoader());
+        loader.setDefaultAssertionStatus(true);
+        Throwable[] failure = new Throwable[1];
+        Thread main = new Thread(() -> {
+            try {
+                Class.forName(className, true, loader)
+                    .getMethod("main", String[].class)
+                    .invoke(null, (Object) new String[0]);
+            } catch (InvocationTargetException e) {
+                failure[0] = e.getCause();
+            } catch (Throwable e) {
+                failure[0] = e;
+            }
+        }, "main");
+        main.setContextClassLoader(loader);
+        main.start();
+        long deadline = System.currentTimeMillis() + timeoutMillis;
+        while (main.isAlive() && System.currentTimeMillis() < deadline) {
+            // Checked every 10ms like the zygote checks its output files
+            main.join(Math.max(1, Math.min(10, deadline - System.currentTimeMillis())));
+            if (killLimit > 0 && out.total() + err.total() > killLimit) {
+                return "KILLED";
+            }
+        }
+        if (main.isAlive()) {
+            return "TIMEOUT";
+        }
+        loader.close();
+        if (failure[0] != null) {
+            System.err.print("Exception in thread \"main\" ");
+            failure[0].printStackTrace();
+            return "FAIL";
+        }
+        return "PASS";
+    }
+}
@@ -1,8 +1,786 @@
 import os
+import io
 import json
 import subprocess
+import sys
 import textwrap
+import threading
 import ast
+import asyncio
+import argparse
+import contextlib
+import functools
+import hashlib
+import re
+import resource
+import selectors
+import shlex
+import shutil
+import signal
+import sqlite3
+import statistics
+import tempfile
+import time
+from collections import Counter, OrderedDict, deque, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from warm_workers import worker_pool, worker_run_result
+
+# Runner settings, changed through configure(); the keyword arguments of
+# process_json and its variants only apply during that call. Pool workers
+# receive a copy when they start.
+SETTINGS = {
+    "artifact_cache": None,  # directory of the compiled-artifact cache, None disables it
+    "artifact_cache_size": 2 * 1024 ** 3,  # bytes kept before LRU eviction
+    "cpp_pch": True,  # precompile the standard headers of C++ tasks
+    "pch_dir": None,  # where precompiled headers live, defaults to <tmp>/sft_runner_pch
+    "java_server": False,  # experimental: compile and run Java solutions in long-lived JVMs
+    "python_forkserver": False,  # fork Python solutions from a pre-warmed interpreter
+    "node_workers": False,  # run JavaScript solutions in a pool of warm node processes
+    "result_store": None,  # SQLite file of finished results, reused for unchanged tasks
+    "cpu_limit": None,  # RLIMIT_CPU in seconds for solution runs
+    "memory_limit": None,  # RLIMIT_AS in bytes for solution runs
+    "workspace": "disk",  # "disk" builds in all_tasks/, "tmpfs" in a scratch dir under workspace_root
+    "workspace_root": None,  # tmpfs mount for the scratch dir, defaults to /dev/shm
+    "retain": None,  # task directories kept in all_tasks/: "all", "failures", "none"; None is failures on tmpfs, else all
+    "output_limit": 1 << 20,  # bytes of stdout and of stderr kept per run (head + tail), None keeps all
+    "output_kill_limit": 16 << 20,  # bytes a solution run may print before it is killed, None never kills
+    "metrics_file": None,  # OpenMetrics textfile written at the end of a run
+    "metrics_json": None,  # JSON summary of the same metrics
+    "trace_file": None,  # Chrome trace-event JSON of the run, None disables tracing
+    "cpp_build_graph": False,  # compile every C++ task up front in one make -j build graph
+    "timing_runs": 0,  # timed runs of each solution after the normal one, 0 disables timing
+    "timing_warmup": 1,  # untimed runs before the timed ones
+    "timing_cpu": None,  # CPU core the timed runs are pinned to, None leaves them unpinned
+    "timing_ratio": 2.0,  # incorrect/canonical median runtime at which a solution counts as just slow
+    "timing_min_time": 0.01,  # seconds; shorter incorrect medians are too noisy to flag
+    "preflight": "fast",  # "off", "fast" (schema, tests, Python syntax) or "full" (plus batched g++/node/javac checks)
+    "dedup": True,  # run each distinct generated program once and share its result
+}
+
+RUN_TIMEOUT = 5
+COMPILE_TIMEOUT = 120
+CPP_FLAGS = []
+JAVAC_FLAGS = []
+
+# Process-wide counters (cache hits/misses, ...); pool workers send theirs
+# back to the parent with every task
+STATS = Counter()
+
+
+def configure(**settings):
+    unknown = set(settings) - set(SETTINGS)
+    if unknown:
+        raise TypeError(f"Unknown runner settings: {', '.join(sorted(unknown))}")
+    SETTINGS.update(settings)
+
+
+@contextlib.contextmanager
+def scoped_settings(**settings):
+    # configure() for the duration of one call; the previous settings are
+    # restored afterwards, in place, as other modules hold SETTINGS itself
+    saved = dict(SETTINGS)
+    configure(**settings)
+    try:
+        yield
+    finally:
+        SETTINGS.clear()
+        SETTINGS.update(saved)
+
+
+# Upper bounds (seconds) of the stage latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Metrics:
+    # Counters and latency histograms of a run, keyed by metric name and a
+    # sorted tuple of (label, value) pairs. Like STATS, pool workers hand
+    # theirs to the parent with every task, which merges them.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            series = self.histograms.setdefault(
+                key, {"buckets": [0] * len(LATENCY_BUCKETS), "count": 0, "sum": 0.0,
+                      "min": seconds, "max": seconds})
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    series["buckets"][i] += 1
+            series["count"] += 1
+            series["sum"] += seconds
+            series["min"] = min(series["min"], seconds)
+            series["max"] = max(series["max"], seconds)
+
+    def take(self):
+        # Hands over everything recorded so far and starts from zero
+        with self.lock:
+            taken = Metrics()
+            taken.counters, self.counters = self.counters, {}
+            taken.histograms, self.histograms = self.histograms, {}
+        return taken
+
+    def merge(self, other):
+        for (name, labels), value in other.counters.items():
+            self.inc(name, value, **dict(labels))
+        with self.lock:
+            for key, theirs in other.histograms.items():
+                ours = self.histograms.get(key)
+                if ours is None:
+                    self.histograms[key] = {**theirs, "buckets": list(theirs["buckets"])}
+                    continue
+                ours["buckets"] = [a + b for a, b in zip(ours["buckets"], theirs["buckets"])]
+                ours["count"] += theirs["count"]
+                ours["sum"] += theirs["sum"]
+                ours["min"] = min(ours["min"], theirs["min"])
+                ours["max"] = max(ours["max"], theirs["max"])
+
+    def __getstate__(self):
+        return {"counters": self.counters, "histograms": self.histograms}
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.counters, self.histograms = state["counters"], state["histograms"]
+
+
+METRICS = Metrics()
+
+METRIC_HELP = {
+    "sft_tasks": ("counter", "Tasks tested, by language and outcome"),
+    "sft_solutions": ("counter", "Solution runs, by language, solution and status"),
+    "sft_timeouts": ("counter", "Solution runs killed at the run timeout"),
+    "sft_perf_only_tasks": ("counter", "Tasks whose incorrect solution only differs in running time"),
+    "sft_runner_events": ("counter", "Runner events such as cache hits and reused results"),
+    "sft_stage_seconds": ("histogram", "Wall time of each pipeline stage, by language"),
+}
+
+
+@contextlib.contextmanager
+def stage_span(stage, language, **args):
+    # Times one pipeline stage (generate, write, task, ...) into the
+    # sft_stage_seconds histogram and, when tracing, the trace
+    start = time.monotonic()
+    try:
+        with trace_span(stage, language=language, **args):
+            yield
+    finally:
+        METRICS.observe("sft_stage_seconds", time.monotonic() - start, stage=stage, language=language)
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def metrics_snapshot():
+    # METRICS plus the STATS counters, which become sft_runner_events
+    snapshot = Metrics()
+    snapshot.merge(METRICS)
+    for event, value in STATS.items():
+        snapshot.inc("sft_runner_events", value, event=event)
+    return snapshot
+
+
+def openmetrics_text(metrics):
+    lines = []
+    names = sorted({name for name, _ in metrics.counters} | {name for name, _ in metrics.histograms})
+    for name in names:
+        kind, help_text = METRIC_HELP.get(name, ("counter", name))
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"# HELP {name} {help_text}")
+        if kind == "counter":
+            for (_, labels), value in sorted(item for item in metrics.counters.items() if item[0][0] == name):
+                lines.append(f"{name}_total{_labels(labels)} {value}")
+            continue
+        for (_, labels), series in sorted(item for item in metrics.histograms.items() if item[0][0] == name):
+            for bound, count in zip(LATENCY_BUCKETS, series["buckets"]):
+                lines.append(f"{name}_bucket{_labels(labels, le=float(bound))} {count}")
+            lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {series['count']}")
+            lines.append(f"{name}_count{_labels(labels)} {series['count']}")
+            lines.append(f"{name}_sum{_labels(labels)} {round(series['sum'], 6)}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_summary(metrics):
+    counters, histograms = {}, {}
+    for (name, labels), value in sorted(metrics.counters.items()):
+        counters.setdefault(name, []).append({"labels": dict(labels), "value": value})
+    for (name, labels), series in sorted(metrics.histograms.items()):
+        histograms.setdefault(name, []).append({
+            "labels": dict(labels),
+            "count": series["count"],
+            "sum": round(series["sum"], 6),
+            "mean": round(series["sum"] / series["count"], 6),
+            "min": round(series["min"], 6),
+            "max": round(series["max"], 6),
+            "buckets": dict(zip(map(str, LATENCY_BUCKETS), series["buckets"])),
+        })
+    return {"counters": counters, "histograms": histograms}
+
+
+def _write_atomic(path, text):
+    # Textfile collectors may read the file at any time, so it is replaced
+    # in one rename
+    staging = f"{path}.tmp-{os.getpid()}"
+    with open(staging, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(staging, path)
+
+
+def export_metrics():
+    if not (SETTINGS["metrics_file"] or SETTINGS["metrics_json"]):
+        return
+    snapshot = metrics_snapshot()
+    if SETTINGS["metrics_file"]:
+        _write_atomic(SETTINGS["metrics_file"], openmetrics_text(snapshot))
+    if SETTINGS["metrics_json"]:
+        _write_atomic(SETTINGS["metrics_json"], json.dumps(metrics_summary(snapshot), indent=2) + "\n")
+
+
+# Chrome trace events ("X" complete events) recorded by this process while
+# a run has tracing on, None otherwise. Timestamps come from the system-wide
+# monotonic clock so the events of pool workers line up with the parent's.
+TRACE_EVENTS = None
+_NO_SPAN = contextlib.nullcontext()
+
+
+def trace_span(name, tid=None, **args):
+    # With tracing off this is one global lookup and a shared no-op context.
+    # tid defaults to the calling thread; coroutines pass a TraceLanes lane.
+    if TRACE_EVENTS is None:
+        return _NO_SPAN
+    return _trace_span(TRACE_EVENTS, name, tid, args)
+
+
+@contextlib.contextmanager
+def _trace_span(events, name, tid, args):
+    start = time.monotonic_ns()
+    try:
+        yield
+    finally:
+        events.append({"name": name, "cat": "sft", "ph": "X", "ts": start / 1000,
+                       "dur": (time.monotonic_ns() - start) / 1000, "pid": os.getpid(),
+                       "tid": threading.get_native_id() if tid is None else tid, "args": args})
+
+
+class TraceLanes:
+    # Virtual thread ids for the coroutines of process_json_async, which all
+    # share the event loop's thread; a finished solution frees its lane for
+    # the next one so the timeline reads like a fixed set of workers
+
+    def __init__(self):
+        self.free = []
+        self.used = 0
+
+    def acquire(self):
+        if TRACE_EVENTS is None:
+            return None
+        if self.free:
+            lane = min(self.free)
+            self.free.remove(lane)
+            return lane
+        self.used += 1
+        return self.used
+
+    def release(self, lane):
+        if lane is not None:
+            self.free.append(lane)
+
+
+def start_trace():
+    global TRACE_EVENTS
+    TRACE_EVENTS = [] if SETTINGS["trace_file"] else None
+
+
+def take_trace():
+    # Hands over the events recorded so far (None when not tracing)
+    global TRACE_EVENTS
+    if TRACE_EVENTS is None:
+        return None
+    events, TRACE_EVENTS = TRACE_EVENTS, []
+    return events
+
+
+def export_trace():
+    # Writes the trace-event JSON that Perfetto and chrome://tracing load,
+    # naming the parent and every worker process
+    global TRACE_EVENTS
+    if TRACE_EVENTS is None or not SETTINGS["trace_file"]:
+        return
+    events, TRACE_EVENTS = TRACE_EVENTS, None
+    names = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+              "args": {"name": "sft runner" if pid == os.getpid() else f"worker {pid}"}}
+             for pid in sorted({event["pid"] for event in events})]
+    _write_atomic(SETTINGS["trace_file"], json.dumps({"traceEvents": names + events, "displayTimeUnit": "ms"}))
+
+
+@functools.lru_cache(maxsize=None)
+def compiler_version(compiler):
+    try:
+        result = subprocess.run([compiler, "-version" if compiler in ("javac", "java") else "--version"],
+                                capture_output=True, text=True)
+    except OSError:
+        return "missing"
+    return (result.stdout + result.stderr).strip()
+
+
+class ArtifactCache:
+    # On-disk cache of compiler outputs keyed by a hash of the generated
+    # source, the compiler version and the flags. Every entry is a directory
+    # holding result.json (return code and diagnostics) and the compiled
+    # files; its mtime is bumped on every hit and the least recently used
+    # entries are evicted once the cache grows past max_bytes.
+
+    EVICT_EVERY = 32
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.stores = 0
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def make_key(source, compiler, flags):
+        digest = hashlib.sha256()
+        for part in (source, compiler_version(compiler), "\0".join(flags)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def fetch(self, key, destination):
+        # destination(name) gives the path each cached file is copied to
+        entry = self._entry(key)
+        try:
+            with open(os.path.join(entry, "result.json")) as f:
+                result = json.load(f)
+            for name in result["files"]:
+                shutil.copy2(os.path.join(entry, "files", name), destination(name))
+            os.utime(entry)
+        except (OSError, ValueError, KeyError):
+            STATS["artifact_cache_misses"] += 1
+            return None
+        STATS["artifact_cache_hits"] += 1
+        return result["returncode"], result["stderr"]
+
+    def store(self, key, returncode, stderr, files):
+        # files maps the cached name to the path of a compiled file
+        entry = self._entry(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+        try:
+            os.makedirs(os.path.join(staging, "files"))
+            for name, path in files.items():
+                shutil.copy2(path, os.path.join(staging, "files", name))
+            with open(os.path.join(staging, "result.json"), "w") as f:
+                json.dump({"returncode": returncode, "stderr": stderr, "files": sorted(files)}, f)
+            os.rename(staging, entry)
+        except OSError:
+            # Another worker stored the same entry first
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+
+        self.stores += 1
+        if self.stores % self.EVICT_EVERY == 1:
+            self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        for shard in os.scandir(self.root):
+            if not shard.is_dir() or shard.name.startswith(".tmp-"):
+                continue
+            for entry in os.scandir(shard.path):
+                size = 0
+                for dirpath, _, filenames in os.walk(entry.path):
+                    size += sum(os.path.getsize(os.path.join(dirpath, name)) for name in filenames)
+                entries.append((entry.stat().st_mtime, size, entry.path))
+                total += size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            STATS["artifact_cache_evictions"] += 1
+
+
+_artifact_caches = {}
+
+
+def artifact_cache():
+    root = SETTINGS["artifact_cache"]
+    if not root:
+        return None
+    key = (root, SETTINGS["artifact_cache_size"])
+    if key not in _artifact_caches:
+        _artifact_caches[key] = ArtifactCache(*key)
+    return _artifact_caches[key]
+
+
+def artifact_cache_stats():
+    return {
+        "hits": STATS["artifact_cache_hits"],
+        "misses": STATS["artifact_cache_misses"],
+        "evictions": STATS["artifact_cache_evictions"],
+    }
+
+
+def rlimits():
+    # (resource, prlimit option, (soft, hard)) for solution runs; compilers
+    # are never limited. The python zygote applies the same limits to its
+    # children and the node/java workers are skipped while any is set.
+    limits = []
+    if SETTINGS["cpu_limit"]:
+        limits.append((resource.RLIMIT_CPU, "cpu", (SETTINGS["cpu_limit"], SETTINGS["cpu_limit"] + 1)))
+    if SETTINGS["memory_limit"]:
+        limits.append((resource.RLIMIT_AS, "as", (SETTINGS["memory_limit"], SETTINGS["memory_limit"])))
+    return limits
+
+
+def limit_command(command):
+    # (command, preexec_fn) that applies the limits inside the child before
+    # the solution is exec'd, so it never runs unlimited. prlimit(1) sets
+    # them on itself and execs the command in the same process; without it
+    # the forked child calls setrlimit, which is safe next to threads as it
+    # takes no locks.
+    limits = rlimits()
+    if not limits:
+        return command, None
+    if PRLIMIT:
+        return [PRLIMIT] + [f"--{option}={soft}:{hard}" for _, option, (soft, hard) in limits] + ["--"] + command, None
+
+    def preexec():
+        for limit, _, value in limits:
+            with contextlib.suppress(ValueError, OSError):
+                resource.setrlimit(limit, value)
+    return command, preexec
+
+
+PRLIMIT = shutil.which("prlimit")
+
+
+def cpu_limit_hit(returncode, rusage=None):
+    # RLIMIT_CPU sends SIGXCPU at the soft limit and SIGKILL at the hard
+    # one; the latter is only told apart from other kills by the CPU time
+    # in rusage
+    cpu_limit = SETTINGS["cpu_limit"]
+    if not cpu_limit:
+        return False
+    if returncode == -signal.SIGXCPU:
+        return True
+    return (returncode == -signal.SIGKILL and rusage is not None
+            and rusage.ru_utime + rusage.ru_stime >= cpu_limit)
+
+
+def record_usage(usage, start, rusage=None, returncode=None):
+    if usage is None:
+        return
+    usage["wall_time"] = round(time.monotonic() - start, 6)
+    if rusage is not None:
+        usage["user_time"] = round(rusage.ru_utime, 6)
+        usage["sys_time"] = round(rusage.ru_stime, 6)
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        usage["max_rss_kb"] = rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+    else:
+        # Warm workers and asyncio reap their own children, so only the
+        # wall time is known; None keeps that apart from a measured zero
+        usage["user_time"] = usage["sys_time"] = usage["max_rss_kb"] = None
+    if returncode is not None:
+        usage["returncode"] = returncode
+
+
+class OutputWindow:
+    # Bounded capture of one output stream: keeps the first and the last
+    # limit // 2 bytes and only counts what falls in between
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.head = bytearray()
+        self.tail = deque()
+        self.tail_size = 0
+        self.total = 0
+
+    def feed(self, data):
+        self.total += len(data)
+        if self.limit is None:
+            self.head += data
+            return
+        room = self.limit // 2 - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data:
+            self.tail.append(data)
+            self.tail_size += len(data)
+            while self.tail_size - len(self.tail[0]) >= self.limit - self.limit // 2:
+                self.tail_size -= len(self.tail.popleft())
+
+    @property
+    def truncated(self):
+        return self.limit is not None and self.total > self.limit
+
+    def getvalue(self):
+        tail = b"".join(self.tail)
+        if not self.truncated:
+            return bytes(self.head) + tail
+        tail = tail[len(tail) - (self.limit - len(self.head)):]
+        skipped = self.total - len(self.head) - len(tail)
+        return bytes(self.head) + f"\n... [{skipped} bytes truncated] ...\n".encode() + tail
+
+
+def output_windows():
+    return OutputWindow(SETTINGS["output_limit"]), OutputWindow(SETTINGS["output_limit"])
+
+
+def output_exceeded(windows, limited):
+    kill_limit = SETTINGS["output_kill_limit"]
+    return limited and kill_limit is not None and sum(window.total for window in windows) > kill_limit
+
+
+def finish_output(windows, killed, usage):
+    # Decoded (stdout, stderr) of a run, noting truncation in usage
+    stdout, stderr = (_decode(window.getvalue()) for window in windows)
+    if usage is not None and any(window.truncated for window in windows):
+        usage["output_truncated"] = True
+        usage["output_bytes"] = sum(window.total for window in windows)
+    if killed:
+        stderr += "\nOutput limit exceeded, process killed.\n"
+        if usage is not None:
+            usage["output_limit_exceeded"] = True
+    return stdout, stderr
+
+
+def _read_pipes(proc, deadline, data=b"", windows=None, limited=False):
+    # Streams stdout and stderr into their OutputWindows while feeding data
+    # to stdin. A limited child that prints more than output_kill_limit
+    # bytes is killed; returns whether that happened.
+    windows = dict(zip((proc.stdout, proc.stderr), windows or output_windows()))
+    killed = False
+    written = 0
+    with selectors.DefaultSelector() as selector:
+        for pipe in windows:
+            selector.register(pipe, selectors.EVENT_READ)
+        if proc.stdin is not None:
+            selector.register(proc.stdin, selectors.EVENT_WRITE)
+        while selector.get_map():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise subprocess.TimeoutExpired(proc.args, 0)
+            for key, _ in selector.select(remaining):
+                if key.fileobj is proc.stdin:
+                    try:
+                        written += os.write(key.fd, data[written:written + 65536])
+                    except BrokenPipeError:
+                        written = len(data)
+                    if written >= len(data):
+                        selector.unregister(proc.stdin)
+                        proc.stdin.close()
+                    continue
+                data_read = os.read(key.fd, 65536)
+                if not data_read:
+                    selector.unregister(key.fileobj)
+                    continue
+                windows[key.fileobj].feed(data_read)
+                if not killed and output_exceeded(windows.values(), limited):
+                    with contextlib.suppress(ProcessLookupError):
+                        os.killpg(proc.pid, signal.SIGKILL)
+                    killed = True
+    return killed
+
+
+def _reap(proc, deadline):
+    # wait4 instead of waitpid so the child's resource usage is kept
+    delay = 0.0005
+    while True:
+        pid, status, rusage = os.wait4(proc.pid, 0 if deadline is None else os.WNOHANG)
+        if pid:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            return rusage
+        if time.monotonic() >= deadline:
+            raise subprocess.TimeoutExpired(proc.args, 0)
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+
+def _decode(data):
+    # Same result as text=True: UTF-8 with universal newlines
+    return data.decode(errors="replace").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def run_process(command, cwd=None, timeout=None, usage=None, limited=False, input=None, cpu=None):
+    # subprocess.run(capture_output=True, text=True) that also records wall
+    # time, user/sys CPU time and peak RSS of the child into usage. Raises
+    # subprocess.TimeoutExpired after killing the child's process group.
+    # Output is capped by the output_limit and output_kill_limit settings.
+    # cpu pins the child to one core (Linux only). A limited child killed
+    # by cpu_limit counts as timed out too.
+    command, preexec = limit_command(command) if limited else (command, None)
+    start = time.monotonic()
+    deadline = None if timeout is None else start + timeout
+    proc = subprocess.Popen(command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            stdin=None if input is None else subprocess.PIPE, start_new_session=True,
+                            preexec_fn=preexec)
+    if cpu is not None:
+        with contextlib.suppress(AttributeError, OSError):
+            os.sched_setaffinity(proc.pid, {cpu})
+    windows = output_windows()
+    try:
+        with proc.stdout, proc.stderr, proc.stdin or contextlib.nullcontext():
+            killed = _read_pipes(proc, deadline, b"" if input is None else input.encode(), windows, limited)
+        rusage = _reap(proc, deadline)
+    except BaseException as error:
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(proc.pid, signal.SIGKILL)
+        _, status, rusage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        record_usage(usage, start, rusage, proc.returncode)
+        if not isinstance(error, subprocess.TimeoutExpired):
+            raise
+        if usage is not None:
+            usage["timed_out"] = True
+        raise subprocess.TimeoutExpired(command, timeout) from None
+    record_usage(usage, start, rusage, proc.returncode)
+    if limited and cpu_limit_hit(proc.returncode, rusage):
+        if usage is not None:
+            usage["timed_out"] = usage["cpu_limit_exceeded"] = True
+        raise subprocess.TimeoutExpired(command, timeout)
+    return (proc.returncode, *finish_output(windows, killed, usage))
+
+
+def run_compiler(command, cwd=None, usage=None):
+    returncode, _, stderr = run_process(command, cwd=cwd, usage=usage)
+    return returncode, stderr
+
+
+# How to compile one generated source: the compiler and flags that go into
+# the artifact cache key, the command to run in cwd, outputs() listing the
+# files of a successful build as {cached name: path} and destination(name)
+# saying where a cached file is restored to
+Build = namedtuple("Build", "compiler flags command cwd outputs destination")
+
+
+def lookup_build(source_path, build):
+    # Returns (cache key, cached (returncode, diagnostics) or None); the key
+    # is None when the artifact cache is off
+    cache = artifact_cache()
+    if cache is None:
+        return None, None
+    with open(source_path) as f:
+        key = cache.make_key(f.read(), build.compiler, build.flags)
+    cached = cache.fetch(key, build.destination)
+    if cached is None:
+        return key, None
+    # Diagnostics mention the source path, which differs between tasks
+    returncode, stderr = cached
+    return key, (returncode, stderr.replace("\0SOURCE\0", source_path))
+
+
+def store_build(key, source_path, build, returncode, stderr):
+    if key is None:
+        return
+    files = build.outputs() if returncode == 0 else {}
+    artifact_cache().store(key, returncode, stderr.replace(source_path, "\0SOURCE\0"), files)
+
+
+# (returncode, diagnostics) of sources the C++ build graph already
+# compiled, keyed by source path; each entry is used once
+PREBUILT = {}
+
+
+def compile_source(source_path, build, compile=None, usage=None):
+    # Runs the build through the artifact cache; compile() may replace the
+    # plain compiler subprocess and returns (returncode, diagnostics)
+    prebuilt = PREBUILT.pop(source_path, None)
+    if prebuilt is not None:
+        if usage is not None:
+            usage["prebuilt"] = True
+        return prebuilt
+    start = time.monotonic()
+    key, cached = lookup_build(source_path, build)
+    if cached is not None:
+        # The wall time of a hit is what restoring the artifacts took
+        record_usage(usage, start)
+        if usage is not None:
+            usage["cached"] = True
+        return cached
+    start = time.monotonic()
+    with trace_span("compile", path=source_path):
+        if compile:
+            returncode, stderr = compile()
+            record_usage(usage, start)
+        else:
+            returncode, stderr = run_compiler(build.command, build.cwd, usage)
+    store_build(key, source_path, build, returncode, stderr)
+    return returncode, stderr
+
+
+def worker_request(kind, fields, timeout, limited=False):
+    # Request to a pooled warm worker under the output settings; only
+    # limited requests (solution runs) are subject to the kill limit
+    kill_limit = (SETTINGS["output_kill_limit"] or 0) if limited else 0
+    return worker_pool(kind).request(fields, timeout, SETTINGS["output_limit"] or 0, kill_limit)
+
+
+def compile_java_in_server(folder, filename):
+    folder = os.path.abspath(folder)
+    result = worker_request("java", ["COMPILE", folder, filename] + JAVAC_FLAGS, COMPILE_TIMEOUT)
+    if result is None or result[0] not in ("OK", "COMPILE ERROR"):
+        return None
+    status, diagnostics = result
+    # Match javac run from inside the folder, which names the bare file
+    return (0 if status == "OK" else 1), diagnostics.replace(folder + os.sep, "")
+
+
+def run_java_in_server(folder, classname):
+    # None means the JVM crashed (e.g. the solution called System.exit) and
+    # the caller should fall back to a fresh `java` process
+    return worker_run_result(worker_request(
+        "java", ["RUN", os.path.abspath(folder), classname, str(RUN_TIMEOUT * 1000)], RUN_TIMEOUT + 10,
+        limited=True))
+
+
+def run_python_in_zygote(filepath):
+    # None means the zygote is gone and the caller should fall back to a
+    # fresh interpreter
+    return worker_run_result(worker_request(
+        "python", ["RUN", os.getcwd(), filepath, str(RUN_TIMEOUT),
+                   str(SETTINGS["cpu_limit"] or 0), str(SETTINGS["memory_limit"] or 0)],
+        RUN_TIMEOUT + 10, limited=True))
+
+
+def run_js_in_worker(filepath):
+    # None means the worker is gone and the caller should fall back to a
+    # fresh node process
+    return worker_run_result(worker_request(
+        "node", ["RUN", os.path.abspath(filepath), str(RUN_TIMEOUT * 1000)], RUN_TIMEOUT + 5, limited=True))
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_test_field(test):
+    # Both programs of a task (and pre-flight) use the same parsed list
+    return ast.literal_eval(test)
+
+
+def task_tests(task):
+    test_field = task["test"]
+    return parse_test_field(test_field) if isinstance(test_field, str) else test_field
+
 
 def create_cpp_file(task, solution_key):
     code = []
@@ -21,36 +799,177 @@ def create_cpp_file(task, solution_key):
 
     # Add main function and tests
     code.append("\nint main() {")
-    test_cases = ast.literal_eval(task["test"]) if isinstance(task["test"], str) else task["test"]
-    for test in test_cases:
+    for test in task_tests(task):
         code.append("    " + test.strip())
     code.append("    cout << \"All tests passed.\\n\";\n    return 0;\n}")
 
     return "\n".join(code)
 
-def run_cpp_file(source_path):
+INCLUDE_RE = re.compile(r"\s*#\s*include\s*<([\w./+-]+)>\s*$")
+PREAMBLE_RE = re.compile(r"\s*($|//|using namespace std\s*;)")
+
+_precompiled_headers = {}
+
+
+def leading_headers(source):
+    # Standard headers included before the first line of real code. Anything
+    # else (macros, conditionals, declarations) ends the scan so that moving
+    # these includes in front of the file cannot change its meaning.
+    headers = []
+    for line in source.splitlines():
+        match = INCLUDE_RE.match(line)
+        if match:
+            if match.group(1) not in headers:
+                headers.append(match.group(1))
+        elif not PREAMBLE_RE.match(line):
+            break
+    return headers
+
+
+def precompiled_header(source):
+    # Returns a header to force-include with -include, backed by a .gch
+    # built once per header set, compiler version and flag set
+    headers = leading_headers(source)
+    if not SETTINGS["cpp_pch"] or not headers:
+        return None
+
+    key = hashlib.sha256("\0".join(
+        [compiler_version("g++"), " ".join(CPP_FLAGS)] + headers).encode("utf-8")).hexdigest()[:32]
+    if key in _precompiled_headers:
+        return _precompiled_headers[key]
+
+    pch_dir = os.path.join(SETTINGS["pch_dir"] or os.path.join(tempfile.gettempdir(), "sft_runner_pch"), key)
+    header_path = os.path.join(pch_dir, "sft_pch.h")
+    if not os.path.exists(header_path + ".gch"):
+        os.makedirs(pch_dir, exist_ok=True)
+        # Concurrent builders write their own files; the renames are atomic
+        staging = f"{header_path}.{os.getpid()}.{threading.get_ident()}"
+        with open(staging, "w") as f:
+            f.write("".join(f"#include <{header}>\n" for header in headers))
+        result = subprocess.run(
+            ["g++"] + CPP_FLAGS + ["-x", "c++-header", staging, "-o", staging + ".gch"],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            os.remove(staging)
+            _precompiled_headers[key] = None
+            return None
+        os.replace(staging, header_path)
+        os.replace(staging + ".gch", header_path + ".gch")
+
+    _precompiled_headers[key] = header_path
+    return header_path
+
+
+def cpp_build(source_path):
+    binary_path = source_path.replace(".cpp", "")
+    with open(source_path) as f:
+        pch = precompiled_header(f.read())
+    return Build(
+        "g++", CPP_FLAGS,
+        ["g++", source_path, "-o", binary_path] + CPP_FLAGS + (["-include", pch] if pch else []),
+        cwd=None,
+        outputs=lambda: {"binary": binary_path},
+        destination=lambda name: binary_path,
+    )
+
+
+def run_cpp_file(source_path, usage=None):
+    usage = {} if usage is None else usage
     binary_path = source_path.replace(".cpp", "")
     try:
-        compile_result = subprocess.run(
-            ["g++", source_path, "-o", binary_path],
-            capture_output=True,
-            text=True
-        )
-        if compile_result.returncode != 0:
-            return "COMPILE ERROR", compile_result.stderr
-
-        run_result = subprocess.run(
-            [binary_path],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        status = "PASS" if run_result.returncode == 0 else "FAIL"
-        return status, run_result.stdout + run_result.stderr
+        returncode, errors = compile_source(source_path, cpp_build(source_path),
+                                            usage=usage.setdefault("compile", {}))
+        if returncode != 0:
+            return "COMPILE ERROR", errors
+
+        with trace_span("run", path=source_path):
+            returncode, stdout, stderr = run_process(
+                [binary_path],
+                timeout=RUN_TIMEOUT,
+                usage=usage.setdefault("run", {}),
+                limited=True
+            )
+        status = "PASS" if returncode == 0 else "FAIL"
+        return status, stdout + stderr
 
     except subprocess.TimeoutExpired:
         return "TIMEOUT", "Execution timed out."
 
+
+def _make_quote(path):
+    return shlex.quote(path).replace("$", "$$")
+
+
+def write_build_graph(graph_dir, builds):
+    # One Makefile target per (source path, Build). Targets are status files
+    # named by index so task paths never have to be valid make target names;
+    # every recipe succeeds and records the compiler's return code instead,
+    # so a failing build never stops the others.
+    # Recipes cd to the runner's cwd so diagnostics name the same paths as
+    # a plain compile; logs and status files are addressed absolutely
+    cwd = _make_quote(os.getcwd())
+    lines = [".PHONY: all", "all: " + " ".join(f"{n}.status" for n in range(len(builds))), ""]
+    for n, (path, build) in enumerate(builds):
+        command = " ".join(_make_quote(arg) for arg in build.command)
+        log, status = (_make_quote(os.path.join(os.path.abspath(graph_dir), f"{n}.{ext}")) for ext in ("log", "status"))
+        lines.append(f"{n}.status:")
+        lines.append(f"\t@cd {cwd} && {command} > {log} 2>&1; echo $$? > {status}")
+    with open(os.path.join(graph_dir, "Makefile"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def build_cpp_graph(items):
+    # Generates the sources of every C++ task up front and compiles all of
+    # them in a single make -j run. The precompiled headers the binaries
+    # share are built once while the graph is written, and builds found in
+    # the artifact cache never enter it. Returns {task_dir: {source path:
+    # (returncode, diagnostics)}} for PREBUILT.
+    if not shutil.which("make"):
+        print("⚠️ make not found, compiling C++ tasks one at a time")
+        return {}
+    results = {}
+    builds = []
+    graph_dir = tempfile.mkdtemp(prefix="sft_build_graph_")
+    try:
+        with stage_span("build_graph", "C++"):
+            for task, task_dir in items:
+                if task.get("language") != "C++":
+                    continue
+                try:
+                    os.makedirs(task_dir, exist_ok=True)
+                    paths = write_sources(task, task_dir)
+                except (KeyError, ValueError, SyntaxError):
+                    # Malformed tasks fail the same way later in test_task
+                    continue
+                for path in paths:
+                    build = cpp_build(path)
+                    key, cached = lookup_build(path, build)
+                    if cached is not None:
+                        results.setdefault(task_dir, {})[path] = cached
+                    else:
+                        builds.append((task_dir, path, build, key))
+
+            if builds:
+                write_build_graph(graph_dir, [(path, build) for _, path, build, _ in builds])
+                subprocess.run(["make", "-s", f"-j{os.cpu_count() or 1}"], cwd=graph_dir,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            for n, (task_dir, path, build, key) in enumerate(builds):
+                try:
+                    with open(os.path.join(graph_dir, f"{n}.status")) as f:
+                        returncode = int(f.read())
+                    with open(os.path.join(graph_dir, f"{n}.log"), errors="replace") as f:
+                        stderr = f.read()
+                except (OSError, ValueError):
+                    returncode, stderr = 1, "Not built by the build graph."
+                store_build(key, path, build, returncode, stderr)
+                results.setdefault(task_dir, {})[path] = (returncode, stderr)
+    finally:
+        shutil.rmtree(graph_dir, ignore_errors=True)
+    STATS["build_graph_targets"] += len(builds)
+    return results
+
+
 def create_python_file(task, solution_key):
     code = []
 
@@ -63,29 +982,33 @@ def create_python_file(task, solution_key):
     # Add test cases
     code.append("\n# Tests")
 
-    test_field = task.get("test")
-    
-    #test_cases = json.loads(task["test"])
-    
-    test_cases = ast.literal_eval(task["test"]) if isinstance(task["test"], str) else task["test"]
-
-    for test in test_cases:
+    for test in task_tests(task):
         code.append(test)
 
     return "\n".join(code)
 
-def run_python_file(filepath):
-    try:
-        result = subprocess.run(
-            ["python", filepath],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        status = "PASS" if result.returncode == 0 else "FAIL"
-        return status, result.stdout + result.stderr
-    except subprocess.TimeoutExpired:
-        return "TIMEOUT", "Execution timed out."
+def run_python_file(filepath, usage=None, source=None):
+    # With source the program is piped to "python -" and filepath is never read
+    usage = {} if usage is None else usage
+    with trace_span("run", path=filepath):
+        if SETTINGS["python_forkserver"] and source is None:
+            start = time.monotonic()
+            result = run_python_in_zygote(filepath)
+            if result is not None:
+                record_usage(usage.setdefault("run", {"worker": "python"}), start)
+                return result
+        try:
+            returncode, stdout, stderr = run_process(
+                ["python", filepath if source is None else "-"],
+                timeout=RUN_TIMEOUT,
+                usage=usage.setdefault("run", {}),
+                limited=True,
+                input=source
+            )
+            status = "PASS" if returncode == 0 else "FAIL"
+            return status, stdout + stderr
+        except subprocess.TimeoutExpired:
+            return "TIMEOUT", "Execution timed out."
 def create_java_file(task, solution_key, classname):
     code = []
 
@@ -101,9 +1024,7 @@ def create_java_file(task, solution_key, classname):
     # Add main method with test cases
     code.append("\n    public static void main(String[] args) {")
     
-    test_field = task.get("test")
-    test_cases = ast.literal_eval(test_field) if isinstance(test_field, str) else test_field
-    for test in test_cases:
+    for test in task_tests(task):
         code.append("        " + test.strip())
     
     code.append('        System.out.println("All tests passed.");')
@@ -114,31 +1035,62 @@ def create_java_file(task, solution_key, classname):
 
     return "\n".join(code)
 
-def run_java_file(filepath):
+def compile_java(folder, filename, usage=None):
+    if SETTINGS["java_server"]:
+        result = compile_java_in_server(folder, filename)
+        if result is not None:
+            if usage is not None:
+                usage["worker"] = "java"
+            return result
+    return run_compiler(java_build(os.path.join(folder, filename)).command, cwd=folder, usage=usage)
+
+
+def java_build(filepath):
+    folder, filename = os.path.split(filepath)
+    return Build(
+        "javac", JAVAC_FLAGS,
+        ["javac"] + JAVAC_FLAGS + [filename],
+        cwd=folder,
+        outputs=lambda: {name: os.path.join(folder, name)
+                         for name in os.listdir(folder) if name.endswith(".class")},
+        destination=lambda name: os.path.join(folder, name),
+    )
+
+
+def run_java_file(filepath, usage=None):
+    usage = {} if usage is None else usage
     folder, filename = os.path.split(filepath)
     classname = filename.replace(".java", "")
 
     try:
         # Compile
-        compile_result = subprocess.run(
-            ["javac", filename],
-            cwd=folder,
-            capture_output=True,
-            text=True
-        )
-        if compile_result.returncode != 0:
-            return "COMPILE ERROR", compile_result.stderr
-
-        # Run with assertions enabled
-        run_result = subprocess.run(
-            ["java", "-ea", classname],
-            cwd=folder,
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        status = "PASS" if run_result.returncode == 0 else "FAIL"
-        return status, run_result.stdout + run_result.stderr
+        compile_usage = usage.setdefault("compile", {})
+        returncode, errors = compile_source(filepath, java_build(filepath),
+                                            lambda: compile_java(folder, filename, compile_usage),
+                                            usage=compile_usage)
+        if returncode != 0:
+            return "COMPILE ERROR", errors
+
+        with trace_span("run", path=filepath):
+            # The server's class loaders share one JVM, so runs under
+            # rlimits go through a fresh java instead
+            if SETTINGS["java_server"] and not rlimits():
+                start = time.monotonic()
+                result = run_java_in_server(folder, classname)
+                if result is not None:
+                    record_usage(usage.setdefault("run", {"worker": "java"}), start)
+                    return result
+
+            # Run with assertions enabled
+            returncode, stdout, stderr = run_process(
+                ["java", "-ea", classname],
+                cwd=folder,
+                timeout=RUN_TIMEOUT,
+                usage=usage.setdefault("run", {}),
+                limited=True
+            )
+        status = "PASS" if returncode == 0 else "FAIL"
+        return status, stdout + stderr
 
     except subprocess.TimeoutExpired:
         return "TIMEOUT", "Execution timed out."
@@ -156,98 +1108,678 @@ def create_js_file(task, solution_key):
     code.append(solution + "\n")
 
     # Add test cases using console.assert
-    test_field = task.get("test")
-    test_cases = ast.literal_eval(test_field) if isinstance(test_field, str) else test_field
-
     code.append("// Tests")
-    for test in test_cases:
+    for test in task_tests(task):
         code.append(test)
 
     code.append('console.log("All tests passed.");')
 
     return "\n".join(code)
 
-def run_js_file(filepath):
+def run_js_file(filepath, usage=None, source=None):
+    # With source the program is piped to "node -" and filepath is never read
+    usage = {} if usage is None else usage
+    with trace_span("run", path=filepath):
+        # Worker contexts share one process, which rlimits can't bound
+        if SETTINGS["node_workers"] and source is None and not rlimits():
+            start = time.monotonic()
+            result = run_js_in_worker(filepath)
+            if result is not None:
+                record_usage(usage.setdefault("run", {"worker": "node"}), start)
+                return result
+        try:
+            returncode, stdout, stderr = run_process(
+                ["node", filepath if source is None else "-"],
+                timeout=RUN_TIMEOUT,
+                usage=usage.setdefault("run", {}),
+                limited=True,
+                input=source
+            )
+            status = "PASS" if returncode == 0 else "FAIL"
+            return status, stdout + stderr
+        except subprocess.TimeoutExpired:
+            return "TIMEOUT", "Execution timed out."
+
+
+def write_solution(task_dir, kind, filename, source):
+    # Each solution is built in its own subdirectory (ir/, incs/) so the two
+    # builds never share source files or compiled artifacts
+    solution_dir = os.path.join(task_dir, kind)
+    os.makedirs(solution_dir, exist_ok=True)
+    path = os.path.join(solution_dir, filename)
+    with open(path, "w") as f:
+        f.write(source)
+    return path
+
+
+# Deduplication: identical generated programs (same language, file name
+# and source) are run once per process. PROGRAMS maps the program_digest of
+# a running program to a future of (status, output, path) that later users
+# of the program share; FINISHED_PROGRAMS keeps the results of the most
+# recent ones. run_tasks does the same for whole tasks.
+DEDUP_CACHE_SIZE = 256
+DEDUP_CACHE_BYTES = 16 << 20
+
+
+class DedupCache:
+    # Finished results kept for later duplicates: at most DEDUP_CACHE_SIZE
+    # of them holding DEDUP_CACHE_BYTES of output, least recently used out
+    # first, so streaming many tasks keeps memory flat
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value, size):
+        if key in self.entries:
+            self.size -= self.entries.pop(key)[1]
+        if size > DEDUP_CACHE_BYTES:
+            return
+        self.entries[key] = (value, size)
+        self.size += size
+        while len(self.entries) > DEDUP_CACHE_SIZE or self.size > DEDUP_CACHE_BYTES:
+            self.size -= self.entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+PROGRAMS = {}
+FINISHED_PROGRAMS = DedupCache()
+_programs_lock = threading.Lock()
+
+
+class ProgramAbandoned(Exception):
+    # Set on a shared program whose owner was interrupted (cancelled, Ctrl-C)
+    # before it finished; its waiters run the program themselves
+    pass
+
+
+def reset_programs():
+    with _programs_lock:
+        PROGRAMS.clear()
+        FINISHED_PROGRAMS.clear()
+
+
+def program_digest(kind, path, source=None):
+    if source is None:
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+    digest = hashlib.sha256()
+    for part in (kind, os.path.basename(path), source):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def claim_program(digest):
+    # (future, True if the caller has to run the program and resolve it)
+    with _programs_lock:
+        STATS["dedup_programs"] += 1
+        future = PROGRAMS.get(digest)
+        if future is None and (result := FINISHED_PROGRAMS.get(digest)) is not None:
+            future = Future()
+            future.set_result(result)
+        if future is not None:
+            STATS["dedup_program_hits"] += 1
+            return future, False
+        future = PROGRAMS[digest] = Future()
+        return future, True
+
+
+def finish_program(digest, future, result):
+    # Resolves a claimed program; its waiters get the result and later
+    # duplicates find it among the finished programs
+    with _programs_lock:
+        if PROGRAMS.get(digest) is future:
+            del PROGRAMS[digest]
+        FINISHED_PROGRAMS.put(digest, result, len(result[1]))
+    if not future.done():
+        future.set_result(result)
+
+
+def abandon_program(digest, future, error):
+    # The owner of a claimed program failed; its waiters get the error, or
+    # run the program themselves if the owner was only interrupted
+    with _programs_lock:
+        if PROGRAMS.get(digest) is future:
+            del PROGRAMS[digest]
+    if not future.done():
+        future.set_exception(error if isinstance(error, Exception) else ProgramAbandoned())
+
+
+def deduplicates_programs():
+    # Timing mode reruns every solution from its own task directory, so
+    # each one has to be built there; whole duplicate tasks are still
+    # shared by run_tasks, timings included
+    return SETTINGS["dedup"] and SETTINGS["timing_runs"] <= 0
+
+
+def shared_result(result, path, usage):
+    # Another task's result for the same program; its output names that
+    # task's directory, which is swapped for this one. The build graph's
+    # result for this copy of the source is never used.
+    PREBUILT.pop(path, None)
+    status, output, origin = result
+    usage["deduplicated"] = True
+    return status, output.replace(os.path.dirname(origin), os.path.dirname(path))
+
+
+def run_deduplicated(run_file, path, usage, *source):
+    if not deduplicates_programs():
+        return run_file(path, usage, *source)
+    digest = program_digest(run_file.__name__, path, *source)
+    future, owner = claim_program(digest)
+    if not owner:
+        try:
+            return shared_result(future.result(), path, usage)
+        except ProgramAbandoned:
+            return run_deduplicated(run_file, path, usage, *source)
     try:
-        result = subprocess.run(
-            ["node", filepath],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        status = "PASS" if result.returncode == 0 else "FAIL"
-        return status, result.stdout + result.stderr
-    except subprocess.TimeoutExpired:
-        return "TIMEOUT", "Execution timed out."
+        status, output = run_file(path, usage, *source)
+    except BaseException as error:
+        abandon_program(digest, future, error)
+        raise
+    finish_program(digest, future, (status, output, path))
+    return status, output
 
 
-def handle_python_task(task, task_dir):
-    ir_path = os.path.join(task_dir, "ir.py")
-    with open(ir_path, "w") as f:
-        f.write(create_python_file(task, "canonical_solution"))
+def run_solutions(run_file, ir_path, incs_path, piped=None):
+    # Canonical and incorrect solutions are evaluated concurrently. piped
+    # holds the (ir, incs) sources when they are fed over stdin instead of
+    # being written to ir_path and incs_path.
+    ir_usage, incs_usage = {}, {}
+    ir_args, incs_args = ((ir_path, ir_usage), (incs_path, incs_usage)) if piped is None else \
+        ((ir_path, ir_usage, piped[0]), (incs_path, incs_usage, piped[1]))
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        ir_future = pool.submit(run_deduplicated, run_file, *ir_args)
+        incs_status, incs_output = run_deduplicated(run_file, *incs_args)
+        ir_status, ir_output = ir_future.result()
 
-    incs_path = os.path.join(task_dir, "incs.py")
-    with open(incs_path, "w") as f:
-        f.write(create_python_file(task, "incorrect_solution"))
+    return (ir_path, ir_status, ir_output, ir_usage), (incs_path, incs_status, incs_output, incs_usage)
 
-    ir_status, ir_output = run_python_file(ir_path)
-    incs_status, incs_output = run_python_file(incs_path)
 
-    return (ir_path, ir_status, ir_output), (incs_path, incs_status, incs_output)
+def generate_sources(task):
+    # [(filename, source)] of the canonical and incorrect programs, or None
+    # for unsupported languages
+    language = task["language"]
+    with stage_span("generate", language):
+        if language == "Python":
+            return [("ir.py", create_python_file(task, "canonical_solution")),
+                    ("incs.py", create_python_file(task, "incorrect_solution"))]
+        if language == "C++":
+            return [("ir.cpp", create_cpp_file(task, "canonical_solution")),
+                    ("incs.cpp", create_cpp_file(task, "incorrect_solution"))]
+        if language == "Java":
+            entry_class = task['entry_point'].split(':')[0]
+            return [(f"{entry_class}.java", create_java_file(task, "canonical_solution", "IR")),
+                    (f"{entry_class}.java", create_java_file(task, "incorrect_solution", "INCS"))]
+        if language == "JavaScript":
+            return [("ir.js", create_js_file(task, "canonical_solution")),
+                    ("incs.js", create_js_file(task, "incorrect_solution"))]
+    return None
 
 
-def handle_cpp_task(task, task_dir):
-    ir_path = os.path.join(task_dir, "ir.cpp")
-    with open(ir_path, "w") as f:
-        f.write(create_cpp_file(task, "canonical_solution"))
+def write_sources(task, task_dir):
+    (ir_name, ir_source), (incs_name, incs_source) = generate_sources(task)
+    with stage_span("write", task["language"]):
+        return (write_solution(task_dir, "ir", ir_name, ir_source),
+                write_solution(task_dir, "incs", incs_name, incs_source))
 
-    incs_path = os.path.join(task_dir, "incs.cpp")
-    with open(incs_path, "w") as f:
-        f.write(create_cpp_file(task, "incorrect_solution"))
 
-    ir_status, ir_output = run_cpp_file(ir_path)
-    incs_status, incs_output = run_cpp_file(incs_path)
+def pipes_sources(language):
+    # In the tmpfs workspace interpreted solutions skip the file system and
+    # are piped to the interpreter, unless a warm worker needs the file
+    return (SETTINGS["workspace"] == "tmpfs" and language in ("Python", "JavaScript")
+            and not SETTINGS[WARM_SETTINGS[language]])
 
-    return (ir_path, ir_status, ir_output), (incs_path, incs_status, incs_output)
 
+def prepare_sources(task, task_dir):
+    # (ir_path, incs_path, piped sources or None) for run_solutions
+    if not pipes_sources(task["language"]):
+        return (*write_sources(task, task_dir), None)
+    (ir_name, ir_source), (incs_name, incs_source) = generate_sources(task)
+    return (os.path.join(task_dir, "ir", ir_name), os.path.join(task_dir, "incs", incs_name),
+            (ir_source, incs_source))
 
-def handle_java_task(task, task_dir):
-    entry_class = task['entry_point'].split(':')[0]
-    ir_path = os.path.join(task_dir, f"{entry_class}.java")
-    with open(ir_path, "w") as f:
-        f.write(create_java_file(task, "canonical_solution", "IR"))
 
-    ir_status, ir_output = run_java_file(ir_path)
+def handle_python_task(task, task_dir):
+    return run_solutions(run_python_file, *prepare_sources(task, task_dir))
+
 
-    incs_path = os.path.join(task_dir, f"{entry_class}.java")
-    with open(incs_path, "w") as f:
-        f.write(create_java_file(task, "incorrect_solution", "INCS"))
+def handle_cpp_task(task, task_dir):
+    return run_solutions(run_cpp_file, *write_sources(task, task_dir))
 
-    incs_status, incs_output = run_java_file(incs_path)
 
-    return (ir_path, ir_status, ir_output), (incs_path, incs_status, incs_output)
+def handle_java_task(task, task_dir):
+    return run_solutions(run_java_file, *write_sources(task, task_dir))
 
 
 def handle_js_task(task, task_dir):
-    ir_path = os.path.join(task_dir, "ir.js")
-    with open(ir_path, "w") as f:
-        f.write(create_js_file(task, "canonical_solution"))
+    return run_solutions(run_js_file, *prepare_sources(task, task_dir))
+
+
+def record_solution_metrics(language, solution, status, usage):
+    METRICS.inc("sft_solutions", language=language, solution=solution, status=status.strip())
+    for stage in ("compile", "run"):
+        if "wall_time" in usage.get(stage, {}):
+            METRICS.observe("sft_stage_seconds", usage[stage]["wall_time"], stage=stage, language=language)
+    if usage.get("run", {}).get("timed_out") or status == "TIMEOUT":
+        METRICS.inc("sft_timeouts", language=language, solution=solution)
+
+
+def record_results(task, ir_result, incs_result):
+    # Log and store test results
+    ir_path, ir_status, ir_output, ir_usage = ir_result
+    incs_path, incs_status, incs_output, incs_usage = incs_result
+    record_solution_metrics(task["language"], "ir", ir_status, ir_usage)
+    record_solution_metrics(task["language"], "incs", incs_status, incs_usage)
+
+    print(f"\n=== Testing Task {task['task_id']} ===")
+    print(f"✅ {os.path.basename(ir_path)}: {ir_status}")
+    task['ir_test_status'] = ir_status.strip()
+    if ir_output.strip():
+        print(ir_output.strip())
+        task['ir_test_output'] = ir_output.strip()
+    if ir_usage:
+        task['ir_test_resources'] = ir_usage
+
+    print(f"❌ {os.path.basename(incs_path)}: {incs_status}")
+    task['incs_test_status'] = incs_status.strip()
+    if incs_output.strip():
+        print(incs_output.strip())
+        task['incs_test_output'] = incs_output.strip()
+    if incs_usage:
+        task['incs_test_resources'] = incs_usage
+
+    METRICS.inc("sft_tasks", language=task["language"], outcome="failed" if task_failed(task) else "valid")
+    return task
+
+
+def task_failed(task):
+    return task.get("ir_test_status") != "PASS" or task.get("incs_test_status") == "PASS"
+
+
+def open_workspace():
+    # Directory the task directories are created in for this run
+    if SETTINGS["workspace"] == "disk":
+        os.makedirs("all_tasks", exist_ok=True)
+        return "all_tasks"
+    if SETTINGS["workspace"] != "tmpfs":
+        raise ValueError(f"Unknown workspace: {SETTINGS['workspace']}")
+    root = SETTINGS["workspace_root"] or ("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+    return tempfile.mkdtemp(prefix="sft_runner_", dir=root)
+
+
+def close_workspace(workspace):
+    if workspace != "all_tasks":
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def retention_policy():
+    # Copying every task back from the tmpfs workspace would undo its point,
+    # so only failures are kept from it unless asked otherwise
+    if SETTINGS["retain"] is not None:
+        return SETTINGS["retain"]
+    return "failures" if SETTINGS["workspace"] == "tmpfs" else "all"
+
+
+def retain_task_dir(task, task_dir):
+    # Applies the retention policy once a task has its results: kept task
+    # directories end up in all_tasks/, everything else is removed
+    retain = retention_policy()
+    if retain not in ("all", "failures", "none"):
+        raise ValueError(f"Unknown retention policy: {retain}")
+    keep = retain == "all" or (retain == "failures" and task_failed(task))
+    kept_dir = os.path.join("all_tasks", os.path.basename(task_dir))
+    if keep and task_dir != kept_dir:
+        if os.path.isdir(task_dir):
+            shutil.copytree(task_dir, kept_dir, dirs_exist_ok=True)
+        if pipes_sources(task["language"]):
+            write_sources(task, kept_dir)
+    if not keep or task_dir != kept_dir:
+        shutil.rmtree(task_dir, ignore_errors=True)
+
+
+# Pre-flight: every task is checked before anything is written or spawned.
+# "fast" checks the schema, parses the test list and syntax-checks Python
+# in-process; "full" also checks the canonical solutions of the compiled
+# and JavaScript tasks with one toolchain call per batch of tasks. A task
+# that cannot pass is rejected with status REJECTED.
+
+REQUIRED_FIELDS = ("task_id", "language", "prompt", "canonical_solution", "incorrect_solution", "test")
+PREFLIGHT_BATCH = 64  # tasks checked together
+PREFLIGHT_CHUNK = 8  # sources per g++ -fsyntax-only / javac call
+
+NODE_CHECK_SOURCE = r"""
+const vm = require('vm');
+const { wrap } = require('module');
+let input = '';
+process.stdin.on('data', chunk => input += chunk);
+process.stdin.on('end', () => {
+  const errors = JSON.parse(input).map(source => {
+    try { new vm.Script(wrap(source)); return null; } catch (e) { return String(e); }
+  });
+  process.stdout.write(JSON.stringify(errors));
+});
+"""
+
+
+def check_task(task):
+    # (rejection reason or None, canonical (filename, source) or None)
+    missing = [field for field in REQUIRED_FIELDS if task.get(field) is None]
+    if missing:
+        return f"missing fields: {', '.join(missing)}", None
+    if task["language"] not in RUNNERS:
+        # Left to test_task, which skips unsupported languages
+        return None, None
+    for field in REQUIRED_FIELDS[2:-1]:
+        if not isinstance(task[field], str):
+            return f"{field} is not a string", None
+    if task["language"] == "Java" and not isinstance(task.get("entry_point"), str):
+        return "Java tasks need an entry_point", None
+    try:
+        tests = task_tests(task)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError) as error:
+        return f"test is not a Python literal: {type(error).__name__}: {error}", None
+    if not isinstance(tests, (list, tuple)) or not all(isinstance(test, str) for test in tests):
+        return "test is not a list of strings", None
+
+    ir_source = generate_sources(task)[0]
+    if task["language"] == "Python":
+        try:
+            ast.parse(ir_source[1])
+        except SyntaxError as error:
+            return f"canonical_solution: SyntaxError: {error.msg} (line {error.lineno})", None
+    return None, ir_source
+
+
+def _diagnostics_by_file(stderr, pattern):
+    # Groups "error" lines of a compiler run by the file they name
+    errors = {}
+    for line in stderr.splitlines():
+        match = re.match(pattern, line)
+        if match:
+            errors.setdefault(match.group(1), match.group(2))
+    return errors
+
+
+def check_cpp_syntax(sources):
+    # One g++ -fsyntax-only call for a chunk of (filename, source)
+    with tempfile.TemporaryDirectory(prefix="sft_preflight_") as folder:
+        names = []
+        for n, (_, source) in enumerate(sources):
+            names.append(f"{n}.cpp")
+            with open(os.path.join(folder, names[-1]), "w") as f:
+                f.write(source)
+        returncode, _, stderr = run_process(["g++", "-fsyntax-only"] + CPP_FLAGS + names, cwd=folder,
+                                            timeout=COMPILE_TIMEOUT)
+    if returncode == 0:
+        return [None] * len(sources)
+    errors = _diagnostics_by_file(stderr, r"(\d+)\.cpp:\d+:\d+: (?:fatal )?error: (.*)")
+    return [errors.get(str(n)) for n in range(len(sources))]
+
+
+def check_java_syntax(sources):
+    # javac refuses two classes of the same name in one compilation, and the
+    # file name is the entry class, which tasks may share: the chunk is
+    # compiled in rounds that hold every file name at most once
+    rounds, seen = [], Counter()
+    for n, (filename, _) in enumerate(sources):
+        if seen[filename] == len(rounds):
+            rounds.append([])
+        rounds[seen[filename]].append(n)
+        seen[filename] += 1
+    errors = [None] * len(sources)
+    for members in rounds:
+        for n, error in zip(members, _check_java_round([sources[n] for n in members])):
+            errors[n] = error
+    return errors
+
+
+def _check_java_round(sources):
+    # One javac call; each file gets its own directory
+    with tempfile.TemporaryDirectory(prefix="sft_preflight_") as folder:
+        paths = []
+        for n, (filename, source) in enumerate(sources):
+            os.makedirs(os.path.join(folder, str(n)))
+            paths.append(os.path.join(str(n), filename))
+            with open(os.path.join(folder, paths[-1]), "w") as f:
+                f.write(source)
+        returncode, _, stderr = run_process(["javac", "-proc:none", "-implicit:none", "-d", "classes"]
+                                            + JAVAC_FLAGS + paths, cwd=folder, timeout=COMPILE_TIMEOUT)
+    if returncode == 0:
+        return [None] * len(sources)
+    # Helper classes of different tasks (Node, Pair, ...) can still clash;
+    # those clashes say nothing about the task itself
+    errors = _diagnostics_by_file(stderr, r"(\d+)[/\\][^:]+\.java:\d+: error: (?!duplicate class)(.*)")
+    return [errors.get(str(n)) for n in range(len(sources))]
+
+
+def check_js_syntax(sources):
+    # Parses every source with vm.Script in a single node process
+    returncode, stdout, _ = run_process(["node", "-e", NODE_CHECK_SOURCE], timeout=COMPILE_TIMEOUT,
+                                        input=json.dumps([source for _, source in sources]))
+    if returncode != 0:
+        return [None] * len(sources)
+    return json.loads(stdout)
+
+
+SYNTAX_CHECKERS = {
+    "C++": (check_cpp_syntax, PREFLIGHT_CHUNK),
+    "Java": (check_java_syntax, PREFLIGHT_CHUNK),
+    "JavaScript": (check_js_syntax, PREFLIGHT_BATCH),
+}
+
+
+def _check_syntax(language, sources):
+    checker, chunk = SYNTAX_CHECKERS[language]
+    chunks = [sources[i:i + chunk] for i in range(0, len(sources), chunk)]
+
+    def run(part):
+        try:
+            return checker(part)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            # A missing or stuck toolchain rejects nothing
+            return [None] * len(part)
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+        return [error for errors in pool.map(run, chunks) for error in errors]
+
+
+def _preflight_batch(batch, needs_check):
+    rejections = [None] * len(batch)
+    pending = {}
+    with trace_span("preflight", tasks=len(batch)):
+        for n, (task, _) in enumerate(batch):
+            if needs_check is not None and not needs_check(task):
+                continue
+            rejections[n], ir_source = check_task(task)
+            if ir_source is not None and SETTINGS["preflight"] == "full" and task["language"] in SYNTAX_CHECKERS:
+                pending.setdefault(task["language"], []).append((n, ir_source))
+        for language, entries in pending.items():
+            errors = _check_syntax(language, [source for _, source in entries])
+            for (n, _), error in zip(entries, errors):
+                if error:
+                    rejections[n] = f"canonical_solution does not compile: {error}"
+    for (task, task_dir), rejection in zip(batch, rejections):
+        yield task, task_dir, rejection
+
+
+def preflight(items, needs_check=None):
+    # Yields (task, task_dir, rejection reason or None) for every item,
+    # checking PREFLIGHT_BATCH tasks at a time. needs_check(task) may exempt
+    # tasks that will not run (e.g. stored results).
+    mode = SETTINGS["preflight"]
+    if mode not in ("off", "fast", "full"):
+        raise ValueError(f"Unknown preflight mode: {mode}")
+    batch = []
+    for item in items:
+        if mode == "off":
+            yield (*item, None)
+            continue
+        batch.append(item)
+        if len(batch) == PREFLIGHT_BATCH:
+            yield from _preflight_batch(batch, needs_check)
+            batch = []
+    yield from _preflight_batch(batch, needs_check)
+
+
+def reject_task(task, reason):
+    print(f"\n=== Rejecting Task {task.get('task_id')}: {reason} ===")
+    task["ir_test_status"] = task["incs_test_status"] = "REJECTED"
+    task["preflight_error"] = reason
+    STATS["preflight_rejected"] += 1
+    METRICS.inc("sft_tasks", language=str(task.get("language")), outcome="rejected")
+    return task
+
+
+def summarize_timings(samples):
+    wall = [sample["wall_time"] for sample in samples]
+    cpu = [(sample.get("user_time") or 0) + (sample.get("sys_time") or 0) for sample in samples]
+    return {"runs": len(samples), "min": min(wall), "median": round(statistics.median(wall), 6),
+            "cpu_min": round(min(cpu), 6), "cpu_median": round(statistics.median(cpu), 6)}
+
+
+# Programs that do nothing, timed to learn each language's startup cost
+STARTUP_PROGRAMS = {
+    "Python": ("empty.py", ""),
+    "C++": ("empty.cpp", "#include <iostream>\nint main() { return 0; }\n"),
+    "Java": ("Empty.java", "public class Empty {\n    public static void main(String[] args) {}\n}\n"),
+    "JavaScript": ("empty.js", ""),
+}
+
+_startup_baselines = {}
+_startup_lock = threading.Lock()
+
 
-    incs_path = os.path.join(task_dir, "incs.js")
-    with open(incs_path, "w") as f:
-        f.write(create_js_file(task, "incorrect_solution"))
+def startup_baseline(language):
+    # Median wall time of an empty program, run the way time_solutions runs
+    # solutions; measured once per process and core. None when the empty
+    # program cannot be built or run.
+    key = (language, SETTINGS["timing_cpu"])
+    with _startup_lock:
+        if key not in _startup_baselines:
+            _startup_baselines[key] = _measure_startup(language)
+        return _startup_baselines[key]
 
-    ir_status, ir_output = run_js_file(ir_path)
-    incs_status, incs_output = run_js_file(incs_path)
 
-    return (ir_path, ir_status, ir_output), (incs_path, incs_status, incs_output)
+def _measure_startup(language):
+    filename, source = STARTUP_PROGRAMS[language]
+    wall = []
+    with tempfile.TemporaryDirectory(prefix="sft_startup_") as folder:
+        path = os.path.join(folder, filename)
+        with open(path, "w") as f:
+            f.write(source)
+        build, command, cwd = solution_plan(language, path)
+        try:
+            if build is not None and run_compiler(build.command, build.cwd)[0] != 0:
+                return None
+            for n in range(SETTINGS["timing_warmup"] + max(SETTINGS["timing_runs"], 5)):
+                usage = {}
+                run_process(command, cwd=cwd, timeout=RUN_TIMEOUT, usage=usage, limited=True,
+                            cpu=SETTINGS["timing_cpu"])
+                if n >= SETTINGS["timing_warmup"]:
+                    wall.append(usage["wall_time"])
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+    return round(statistics.median(wall), 6)
 
 
-def test_task(task):
+def time_solutions(task, ir_path, incs_path):
+    # Timing mode: once both solutions have run, each one that ran to
+    # completion is executed timing_warmup times untimed and timing_runs
+    # times timed, alternating between the two so drift hits both alike.
+    # Warm workers are bypassed; every run is a fresh process. The reported
+    # medians are whole-process wall times; the ratio compares them after
+    # subtracting the language's startup baseline, which would otherwise
+    # pull every ratio towards 1.
+    language = task["language"]
+    if SETTINGS["timing_runs"] <= 0 or task["ir_test_status"] != "PASS":
+        return None
+    sources = [source for _, source in generate_sources(task)] if pipes_sources(language) else [None, None]
+    plans = {"ir": (ir_path, sources[0])}
+    if task["incs_test_status"] in ("PASS", "FAIL"):
+        plans["incs"] = (incs_path, sources[1])
+
+    samples = {name: [] for name in plans}
+    timing = {"incs": {"timed_out": True}} if task["incs_test_status"] == "TIMEOUT" else {}
+    with trace_span("timing", task_id=task["task_id"]):
+        for n in range(SETTINGS["timing_warmup"] + SETTINGS["timing_runs"]):
+            for name, (path, source) in list(plans.items()):
+                _, command, cwd = solution_plan(language, path, source is not None)
+                usage = {}
+                try:
+                    run_process(command, cwd=cwd, timeout=RUN_TIMEOUT, usage=usage, limited=True,
+                                input=source, cpu=SETTINGS["timing_cpu"])
+                except subprocess.TimeoutExpired:
+                    timing[name] = {"timed_out": True}
+                    del plans[name]
+                    continue
+                except OSError as error:
+                    timing[name] = {"error": str(error)}
+                    del plans[name]
+                    continue
+                if n >= SETTINGS["timing_warmup"]:
+                    samples[name].append(usage)
+    for name, runs in samples.items():
+        if name not in timing:
+            timing[name] = summarize_timings(runs)
+
+    ir, incs = timing["ir"], timing.get("incs")
+    if ir.get("timed_out") or "error" in ir or (incs is not None and "error" in incs):
+        return timing
+    if incs is None or incs.get("timed_out"):
+        # A timeout, whether from a slow algorithm or an endless loop, is
+        # only told apart from the canonical solution by its running time
+        timing["perf_only"] = task["incs_test_status"] == "TIMEOUT" or (
+            incs is not None and task["incs_test_status"] == "PASS")
+        return timing
+    timing["startup"] = startup_baseline(language)
+    ir_time, incs_time = (max(0, median - (timing["startup"] or 0)) for median in (ir["median"], incs["median"]))
+    timing["ratio"] = round(incs_time / ir_time, 3) if ir_time else None
+    timing["perf_only"] = (task["incs_test_status"] == "PASS" and timing["ratio"] is not None
+                           and timing["ratio"] >= SETTINGS["timing_ratio"]
+                           and incs_time >= SETTINGS["timing_min_time"])
+    return timing
+
+
+def record_timing(task, timing):
+    if timing is None:
+        return
+    task["timing"] = timing
+    line = f"⏱️ canonical median {timing['ir'].get('median', 'timeout')}s"
+    if "incs" in timing:
+        line += f", incorrect median {timing['incs'].get('median', 'timeout')}s"
+    if timing.get("ratio") is not None:
+        line += f", ratio {timing['ratio']}"
+    print(line)
+    if timing.get("perf_only"):
+        print("🐢 The incorrect solution is only distinguishable by its running time")
+        STATS["perf_only_tasks"] += 1
+        METRICS.inc("sft_perf_only_tasks", language=task["language"])
+
+
+def test_task(task, task_dir=None):
+    with stage_span("task", task["language"], task_id=task["task_id"]):
+        return _test_task(task, task_dir)
+
+
+def _test_task(task, task_dir=None):
     task_id = task["task_id"]
     language = task["language"]
-    task_dir = os.path.join("all_tasks", task_id)
-    os.makedirs(task_dir, exist_ok=True)
+    if task_dir is None:
+        task_dir = os.path.join("all_tasks", task_id)
+    if not pipes_sources(language):
+        os.makedirs(task_dir, exist_ok=True)
 
     print(f"\n=== Creating Task {task_id} ({language}) ===")
 
@@ -261,34 +1793,684 @@ def test_task(task):
         ir_result, incs_result = handle_js_task(task, task_dir)
     else:
         print(f"⚠️ Skipping unsupported language: {language}")
+        METRICS.inc("sft_tasks", language=language, outcome="unsupported")
         return None
 
-    # Log and store test results
-    ir_path, ir_status, ir_output = ir_result
-    incs_path, incs_status, incs_output = incs_result
+    result = record_results(task, ir_result, incs_result)
+    record_timing(task, time_solutions(task, ir_result[0], incs_result[0]))
+    retain_task_dir(task, task_dir)
+    return result
 
-    print(f"\n=== Testing Task {task_id} ===")
-    print(f"✅ {os.path.basename(ir_path)}: {ir_status}")
-    task['ir_test_status'] = ir_status.strip()
-    if ir_output.strip():
-        print(ir_output.strip())
-        task['ir_test_output'] = ir_output.strip()
 
-    print(f"❌ {os.path.basename(incs_path)}: {incs_status}")
-    task['incs_test_status'] = incs_status.strip()
-    if incs_output.strip():
-        print(incs_output.strip())
-        task['incs_test_output'] = incs_output.strip()
+# Settings that change what a run reports: resource limits, output
+# truncation, whether pre-flight may reject the task and the warm workers,
+# whose output and failure modes differ from a fresh process
+RESULT_SETTINGS = ("preflight", "cpu_limit", "memory_limit", "output_limit", "output_kill_limit",
+                   "python_forkserver", "node_workers", "java_server")
+TIMING_SETTINGS = ("timing_runs", "timing_warmup", "timing_cpu", "timing_ratio", "timing_min_time")
+RESULT_KEY_FIELDS = ("prompt", "canonical_solution", "incorrect_solution", "test", "language", "entry_point")
+TOOLCHAINS = {
+    "Python": ("python",),
+    "C++": ("g++",),
+    "Java": ("javac", "java"),
+    "JavaScript": ("node",),
+}
+
+
+def result_key(task):
+    # Hash of everything that decides a task's outcome: its content, the
+    # toolchain versions and the runner's flags, timeout and limits
+    toolchain = [compiler_version(tool) for tool in TOOLCHAINS.get(task.get("language"), ())]
+    parts = [[task.get(field) for field in RESULT_KEY_FIELDS], toolchain, CPP_FLAGS, JAVAC_FLAGS, RUN_TIMEOUT,
+             [field for field in REQUIRED_FIELDS if field not in task], [SETTINGS[name] for name in RESULT_SETTINGS]]
+    if SETTINGS["timing_runs"] > 0:
+        # Results with timings are only reused by runs that time the same way
+        parts.append([SETTINGS[name] for name in TIMING_SETTINGS])
+    payload = json.dumps(parts, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultStore:
+    # Persistent map from result_key to the fields test_task added to a task.
+    # Results are committed one by one, so an interrupted run resumes from
+    # the first task that had not finished.
 
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, fields TEXT NOT NULL)")
+
+    def get(self, key):
+        row = self.db.execute("SELECT fields FROM results WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, fields):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO results VALUES (?, ?)", (key, json.dumps(fields)))
+
+    def close(self):
+        self.db.close()
+
+
+def assign_task_dirs(tasks, workspace="all_tasks"):
+    # Every task gets its own working directory, even when task_ids repeat;
+    # one without a task_id is named by its position and left to pre-flight
+    seen = {}
+    for n, task in enumerate(tasks):
+        task_id = str(task.get("task_id", f"task_{n}"))
+        count = seen.get(task_id, 0)
+        seen[task_id] = count + 1
+        dirname = task_id if count == 0 else f"{task_id}__{count}"
+        yield task, os.path.join(workspace, dirname)
+
+
+def _init_worker(settings):
+    configure(**settings)
+    reset_programs()
+    # A forked worker starts with a copy of the parent's metrics
+    METRICS.take()
+    start_trace()
+
+
+def _test_task_worker(item):
+    # Runs inside a pool process; the log is replayed by the parent so the
+    # output of concurrent tasks does not interleave
+    task, task_dir, prebuilt = item
+    PREBUILT.update(prebuilt)
+    log = io.StringIO()
+    before = STATS.copy()
+    with contextlib.redirect_stdout(log):
+        result = test_task(task, task_dir)
+    return result, log.getvalue(), STATS - before, METRICS.take(), take_trace()
+
+
+def _done(result, log=""):
+    future = Future()
+    future.set_result((result, log, Counter(), None, None))
+    return future
+
+
+def _collect(future):
+    result, log, stats, metrics, events = future.result()
+    print(log, end="")
+    STATS.update(stats)
+    if metrics is not None:
+        METRICS.merge(metrics)
+    if events and TRACE_EVENTS is not None:
+        TRACE_EVENTS.extend(events)
+    return result
+
+
+def _reuse(task, fields):
+    task.update(fields)
+    STATS["result_store_hits"] += 1
+    return (f"\n=== Reusing stored result for Task {task.get('task_id')}: "
+            f"{task.get('ir_test_status')} / {task.get('incs_test_status')} ===\n")
+
+
+def task_digest(task):
+    # Both generated programs of a task, or None for unsupported languages
+    sources = generate_sources(task)
+    if sources is None:
+        return None
+    digest = hashlib.sha256(task["language"].encode("utf-8"))
+    for filename, source in sources:
+        digest.update(program_digest(task["language"], filename, source).encode("ascii"))
+    return digest.hexdigest()
+
+
+def copy_task_result(original, original_keys, task, task_dir, original_dir):
+    # Gives a task the result of an identical task that already ran
+    if original is None:
+        return None
+    STATS["dedup_task_hits"] += 1
+    STATS["dedup_programs"] += 2
+    STATS["dedup_program_hits"] += 2
+    print(f"\n=== Task {task['task_id']} is identical to Task {original['task_id']}: "
+          f"{original.get('ir_test_status')} / {original.get('incs_test_status')} ===")
+    for name, value in original.items():
+        if name in original_keys:
+            continue
+        if name.endswith("_test_output"):
+            value = value.replace(original_dir, task_dir)
+        elif name.endswith("_test_resources"):
+            value = {"deduplicated": True}
+        task[name] = value
+    retain = retention_policy()
+    if retain == "all" or (retain == "failures" and task_failed(task)):
+        write_sources(task, os.path.join("all_tasks", os.path.basename(task_dir)))
     return task
 
 
-def process_json(json_list):
-  json_list=json.loads(json_list)
-  AllTasks = []
-  os.makedirs("all_tasks", exist_ok=True)
-  for task in json_list:
-      result = test_task(task)
-      if result:
-          AllTasks.append(result)
+def run_tasks(tasks, jobs=1):
+    # Yields test_task results in input order. With jobs > 1 the tasks are
+    # spread over a process pool, keeping at most 2 * jobs of them in flight.
+    # Tasks found in the result store are not run again.
+    if not jobs:
+        jobs = os.cpu_count() or 1
+    store = ResultStore(SETTINGS["result_store"]) if SETTINGS["result_store"] else None
+    workspace = open_workspace()
+    start_trace()
+    pool = None
+    if jobs > 1:
+        pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                   initargs=(dict(SETTINGS),))
+    pending = deque()
+    # task_digest -> (future, input keys, task_dir) of a task still in
+    # flight; later tasks with the same pair of programs copy its result,
+    # or once it finished the compact record kept in finished
+    originals = {}
+    finished = DedupCache()
+    reset_programs()
+
+    def finish():
+        future, key, input_keys, duplicate, digest = pending.popleft()
+        result = _collect(future) if duplicate is None else copy_task_result(future.result()[0], *duplicate)
+        if digest is not None:
+            _, _, task_dir = originals.pop(digest)
+            if result is not None:
+                # Only the fields the run added, outputs already capped by
+                # output_limit, outlive the task
+                fields = {name: value for name, value in result.items() if name not in input_keys}
+                size = sum(len(value) for value in fields.values() if isinstance(value, str))
+                finished.put(digest, ({"task_id": result.get("task_id"), **fields}, task_dir), size)
+        if key is not None and result is not None:
+            with trace_span("store_result", task_id=result.get("task_id")):
+                store.put(key, {name: value for name, value in result.items() if name not in input_keys})
+        return result
+
+    def unstored(task):
+        return store is None or store.get(result_key(task)) is None
+
+    try:
+        items = preflight(assign_task_dirs(tasks, workspace), unstored)
+        prebuilt = {}
+        if SETTINGS["cpp_build_graph"]:
+            # Every C++ task is compiled before the first one runs
+            items = list(items)
+            prebuilt = build_cpp_graph([(task, task_dir) for task, task_dir, rejection in items
+                                        if rejection is None and unstored(task)])
+        for task, task_dir, rejection in items:
+            key = result_key(task) if store is not None else None
+            stored = store.get(key) if key is not None else None
+            digest = task_digest(task) if SETTINGS["dedup"] and stored is None and rejection is None else None
+            if stored is not None:
+                pending.append((_done(task, _reuse(task, stored)), None, None, None, None))
+            elif rejection is not None:
+                input_keys = set(task)
+                pending.append((_done(reject_task(task, rejection)), key, input_keys, None, None))
+            elif digest in originals:
+                prebuilt.pop(task_dir, None)
+                future, original_keys, original_dir = originals[digest]
+                duplicate = (original_keys, task, task_dir, original_dir)
+                pending.append((future, key, set(task), duplicate, None))
+            elif digest is not None and (record := finished.get(digest)) is not None:
+                prebuilt.pop(task_dir, None)
+                original, original_dir = record
+                input_keys = set(task)
+                result = copy_task_result(original, {"task_id"}, task, task_dir, original_dir)
+                pending.append((_done(result), key, input_keys, None, None))
+            else:
+                input_keys = set(task)
+                if pool is None:
+                    PREBUILT.update(prebuilt.pop(task_dir, {}))
+                    future = _done(test_task(task, task_dir))
+                else:
+                    future = pool.submit(_test_task_worker, (task, task_dir, prebuilt.pop(task_dir, {})))
+                pending.append((future, key, input_keys, None, digest))
+                if digest is not None:
+                    originals[digest] = (future, input_keys, task_dir)
+            while len(pending) > (2 * jobs if pool else 0):
+                yield finish()
+        while pending:
+            yield finish()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if store is not None:
+            store.close()
+        close_workspace(workspace)
+
+
+def print_summary():
+    if SETTINGS["result_store"]:
+        print(f"\nResult store: {STATS['result_store_hits']} tasks reused")
+    if SETTINGS["artifact_cache"]:
+        stats = artifact_cache_stats()
+        print(f"\nArtifact cache: {stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['evictions']} evictions")
+    if SETTINGS["cpp_build_graph"]:
+        print(f"\nBuild graph: {STATS['build_graph_targets']} C++ sources compiled")
+    if SETTINGS["timing_runs"] > 0:
+        print(f"\nTiming: {STATS['perf_only_tasks']} tasks whose incorrect solution is only slower")
+    if STATS["preflight_rejected"]:
+        print(f"\nPre-flight: {STATS['preflight_rejected']} tasks rejected")
+    if SETTINGS["dedup"] and STATS["dedup_programs"]:
+        hits, programs = STATS["dedup_program_hits"], STATS["dedup_programs"]
+        print(f"\nDedup: {STATS['dedup_task_hits']} duplicate tasks reused, "
+              f"{hits} of {programs} program runs shared ({hits / programs:.1%})")
+
+
+def process_json(json_list, jobs=1, **settings):
+  with scoped_settings(**settings):
+    json_list=json.loads(json_list)
+    AllTasks = []
+    os.makedirs("all_tasks", exist_ok=True)
+    for result in run_tasks(json_list, jobs):
+        if result:
+            AllTasks.append(result)
+    print_summary()
+    export_metrics()
+    export_trace()
   return AllTasks
+
+
+def iter_json_array(f, chunk_size=1 << 16):
+    # Decodes the elements of a top-level JSON array one at a time
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("expected a JSON array")
+    pos = 1
+    eof = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == "]":
+            return
+        try:
+            if pos == len(buffer):
+                raise json.JSONDecodeError("need more data", buffer, pos)
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Grow the read size so very large tasks are not re-parsed too often
+            chunk = f.read(max(chunk_size, len(buffer) - pos))
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield item
+        pos = end
+
+
+def iter_tasks(path):
+    # Reads tasks lazily from a JSONL file or a file holding one JSON array
+    with open(path, encoding="utf-8") as f:
+        head = f.read(1)
+        while head.isspace():
+            head = f.read(1)
+        f.seek(0)
+        if head == "[":
+            yield from iter_json_array(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def process_json_stream(input_path, output_path, jobs=1, fsync_every=100, **settings):
+    # Streaming variant of process_json: every result is appended to the
+    # output JSONL file as soon as it is ready and fsync'd in batches, so
+    # memory stays flat and a crash only loses the unsynced tail
+    with scoped_settings(**settings):
+        os.makedirs("all_tasks", exist_ok=True)
+        written = 0
+        with open(output_path, "w", encoding="utf-8") as out:
+            for result in run_tasks(iter_tasks(input_path), jobs):
+                if not result:
+                    continue
+                with trace_span("write_result", task_id=result.get("task_id")):
+                    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    out.flush()
+                    written += 1
+                    if written % fsync_every == 0:
+                        os.fsync(out.fileno())
+            os.fsync(out.fileno())
+        print_summary()
+        export_metrics()
+        export_trace()
+    return written
+
+
+# asyncio execution core: every compile and run stage is an asyncio
+# subprocess gated by per-language semaphores, so memory-heavy JVMs and
+# CPU-heavy g++ runs can be limited separately from cheap interpreter runs
+
+RUNNERS = {
+    "Python": run_python_file,
+    "C++": run_cpp_file,
+    "Java": run_java_file,
+    "JavaScript": run_js_file,
+}
+WARM_SETTINGS = {
+    "Python": "python_forkserver",
+    "Java": "java_server",
+    "JavaScript": "node_workers",
+}
+
+
+def default_limits():
+    cpus = os.cpu_count() or 1
+    jvms = max(1, cpus // 4)
+    return {
+        "Python": {"compile": cpus, "run": cpus},
+        "C++": {"compile": cpus, "run": cpus},
+        "Java": {"compile": jvms, "run": jvms},
+        "JavaScript": {"compile": cpus, "run": cpus},
+    }
+
+
+def solution_plan(language, path, piped=False):
+    # (Build or None, run command, run cwd) for one generated solution
+    if language == "C++":
+        return cpp_build(path), [path.replace(".cpp", "")], None
+    if language == "Java":
+        folder, filename = os.path.split(path)
+        return java_build(path), ["java", "-ea", filename.replace(".java", "")], folder
+    interpreter = "python" if language == "Python" else "node"
+    return None, [interpreter, "-" if piped else path], None
+
+
+async def exec_async(command, cwd=None, timeout=None, usage=None, limited=False, input=None):
+    # Each child leads its own process group; on timeout or cancellation the
+    # whole group is killed so grandchildren cannot outlive the run. asyncio
+    # reaps children itself, so only wall time is recorded here and only a
+    # SIGXCPU exit (the cpu_limit soft limit) is reported as a timeout.
+    command, preexec = limit_command(command) if limited else (command, None)
+    start = time.monotonic()
+    spawn = asyncio.ensure_future(asyncio.create_subprocess_exec(
+        *command, cwd=cwd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        stdin=None if input is None else asyncio.subprocess.PIPE, start_new_session=True, preexec_fn=preexec,
+    ))
+    try:
+        proc = await asyncio.shield(spawn)
+    except asyncio.CancelledError:
+        # Cancelled while the child was starting: it is killed and reaped
+        # rather than left running
+        with contextlib.suppress(OSError):
+            proc = await spawn
+            with contextlib.suppress(ProcessLookupError):
+                os.killpg(proc.pid, signal.SIGKILL)
+            await proc.wait()
+        raise
+    windows = output_windows()
+    killed = False
+
+    async def feed():
+        if proc.stdin is not None:
+            with contextlib.suppress(BrokenPipeError, ConnectionResetError):
+                proc.stdin.write(input.encode())
+                await proc.stdin.drain()
+            proc.stdin.close()
+
+    async def drain(stream, window):
+        nonlocal killed
+        while chunk := await stream.read(65536):
+            window.feed(chunk)
+            if not killed and output_exceeded(windows, limited):
+                with contextlib.suppress(ProcessLookupError):
+                    os.killpg(proc.pid, signal.SIGKILL)
+                killed = True
+
+    async def communicate():
+        await asyncio.gather(feed(), drain(proc.stdout, windows[0]), drain(proc.stderr, windows[1]))
+        await proc.wait()
+
+    try:
+        await asyncio.wait_for(communicate(), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(proc.pid, signal.SIGKILL)
+        await proc.wait()
+        record_usage(usage, start, returncode=proc.returncode)
+        if usage is not None:
+            usage["timed_out"] = True
+        raise
+    record_usage(usage, start, returncode=proc.returncode)
+    if limited and cpu_limit_hit(proc.returncode):
+        if usage is not None:
+            usage["timed_out"] = usage["cpu_limit_exceeded"] = True
+        raise asyncio.TimeoutError
+    return (proc.returncode, *finish_output(windows, killed, usage))
+
+
+async def run_solution_async(language, path, semaphores, usage, source=None, lane=None):
+    compile_slots, run_slots = semaphores[language]
+    if language in WARM_SETTINGS and SETTINGS[WARM_SETTINGS[language]]:
+        # Warm workers are driven synchronously; give them a thread
+        async with run_slots:
+            return await asyncio.to_thread(RUNNERS[language], path, usage)
+
+    build, command, cwd = await asyncio.to_thread(solution_plan, language, path, source is not None)
+    if build is not None:
+        start = time.monotonic()
+        key, cached = None, PREBUILT.pop(path, None)
+        if cached is None:
+            key, cached = lookup_build(path, build)
+        if cached is None:
+            async with compile_slots:
+                with trace_span("compile", lane, path=path):
+                    returncode, _, errors = await exec_async(build.command, build.cwd,
+                                                             usage=usage.setdefault("compile", {}))
+            store_build(key, path, build, returncode, errors)
+        else:
+            returncode, errors = cached
+            usage["compile"] = {"cached": True} if key is not None else {"prebuilt": True}
+            if key is not None:
+                record_usage(usage["compile"], start)
+        if returncode != 0:
+            return "COMPILE ERROR", errors
+
+    async with run_slots:
+        try:
+            with trace_span("run", lane, path=path):
+                returncode, stdout, stderr = await exec_async(
+                    command, cwd, RUN_TIMEOUT, usage=usage.setdefault("run", {}), limited=True, input=source)
+        except asyncio.TimeoutError:
+            return "TIMEOUT", "Execution timed out."
+    return ("PASS" if returncode == 0 else "FAIL"), stdout + stderr
+
+
+async def run_solution_deduplicated(language, path, semaphores, usage, source=None, lane=None):
+    if not deduplicates_programs():
+        return await run_solution_async(language, path, semaphores, usage, source, lane)
+    digest = program_digest(RUNNERS[language].__name__, path, source)
+    future, owner = claim_program(digest)
+    if not owner:
+        # Shielded: a waiter being cancelled must not cancel the run it shares
+        shared = asyncio.wrap_future(future)
+        try:
+            return shared_result(await asyncio.shield(shared), path, usage)
+        except ProgramAbandoned:
+            return await run_solution_deduplicated(language, path, semaphores, usage, source, lane)
+        except asyncio.CancelledError:
+            # Nobody awaits the shared run any more; retrieve how it ends
+            shared.add_done_callback(lambda done: done.cancelled() or done.exception())
+            raise
+    try:
+        status, output = await run_solution_async(language, path, semaphores, usage, source, lane)
+    except BaseException as error:
+        abandon_program(digest, future, error)
+        raise
+    finish_program(digest, future, (status, output, path))
+    return status, output
+
+
+async def test_task_async(task, task_dir, semaphores, store=None, key=None, lanes=None):
+    language = task["language"]
+    if language not in RUNNERS:
+        print(f"\n⚠️ Skipping unsupported language: {language}")
+        METRICS.inc("sft_tasks", language=language, outcome="unsupported")
+        return None
+    lanes = lanes or TraceLanes()
+    ir_lane, incs_lane = lanes.acquire(), lanes.acquire()
+    start = time.monotonic()
+    try:
+        with trace_span("task", ir_lane, language=language, task_id=task["task_id"]):
+            input_keys = set(task)
+            ir_path, incs_path, piped = prepare_sources(task, task_dir)
+            ir_source, incs_source = piped or (None, None)
+            ir_usage, incs_usage = {}, {}
+            runs = [
+                asyncio.ensure_future(run_solution_deduplicated(
+                    language, ir_path, semaphores, ir_usage, ir_source, ir_lane)),
+                asyncio.ensure_future(run_solution_deduplicated(
+                    language, incs_path, semaphores, incs_usage, incs_source, incs_lane)),
+            ]
+            try:
+                (ir_status, ir_output), (incs_status, incs_output) = await asyncio.gather(*runs)
+            finally:
+                # gather gives up as soon as one run is cancelled; the other
+                # one still has to kill and reap its process first
+                for run in runs:
+                    run.cancel()
+                await asyncio.gather(*runs, return_exceptions=True)
+            result = record_results(task, (ir_path, ir_status, ir_output, ir_usage),
+                                    (incs_path, incs_status, incs_output, incs_usage))
+            record_timing(task, await asyncio.to_thread(time_solutions, task, ir_path, incs_path))
+            await asyncio.to_thread(retain_task_dir, task, task_dir)
+            METRICS.observe("sft_stage_seconds", time.monotonic() - start, stage="task", language=language)
+            if key is not None:
+                with trace_span("store_result", ir_lane, task_id=task["task_id"]):
+                    store.put(key, {name: value for name, value in result.items() if name not in input_keys})
+    finally:
+        lanes.release(ir_lane)
+        lanes.release(incs_lane)
+    return result
+
+
+async def iterate_in_thread(iterator):
+    # Advances a blocking iterator in a worker thread, one item at a time
+    while (item := await asyncio.to_thread(next, iterator, None)) is not None:
+        yield item
+
+
+async def process_json_async(json_list, limits=None, max_pending=256, **settings):
+    # Async variant of process_json: an async generator yielding each
+    # enriched task as soon as it completes (not in input order). limits
+    # overrides default_limits(), e.g. {"Java": {"compile": 1, "run": 2}}.
+    with scoped_settings(**settings):
+        tasks = json.loads(json_list) if isinstance(json_list, str) else json_list
+        merged = default_limits()
+        for language, slots in (limits or {}).items():
+            merged.setdefault(language, {"compile": 1, "run": 1}).update(slots)
+        semaphores = {language: (asyncio.Semaphore(slots["compile"]), asyncio.Semaphore(slots["run"]))
+                      for language, slots in merged.items()}
+        os.makedirs("all_tasks", exist_ok=True)
+        store = ResultStore(SETTINGS["result_store"]) if SETTINGS["result_store"] else None
+        workspace = open_workspace()
+        start_trace()
+        lanes = TraceLanes()
+        reset_programs()
+
+        running = set()
+        try:
+            # Pre-flight batches run in a thread so they do not stall running
+            # tasks; the result store stays on this thread, so every task is checked
+            checked = preflight(assign_task_dirs(tasks, workspace))
+            if SETTINGS["cpp_build_graph"]:
+                checked = await asyncio.to_thread(list, checked)
+                built = await asyncio.to_thread(build_cpp_graph, [
+                    (task, task_dir) for task, task_dir, rejection in checked
+                    if rejection is None and (store is None or store.get(result_key(task)) is None)])
+                for paths in built.values():
+                    PREBUILT.update(paths)
+            async for task, task_dir, rejection in iterate_in_thread(iter(checked)):
+                key = result_key(task) if store is not None else None
+                stored = store.get(key) if key is not None else None
+                if stored is not None:
+                    print(_reuse(task, stored), end="")
+                    yield task
+                    continue
+                if rejection is not None:
+                    input_keys = set(task)
+                    result = reject_task(task, rejection)
+                    if key is not None:
+                        store.put(key, {name: value for name, value in result.items() if name not in input_keys})
+                    yield result
+                    continue
+                running.add(asyncio.ensure_future(test_task_async(task, task_dir, semaphores, store, key, lanes)))
+                while len(running) >= max_pending:
+                    done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    for future in done:
+                        if future.result():
+                            yield future.result()
+            while running:
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    if future.result():
+                        yield future.result()
+        finally:
+            # Tasks left over when the caller stops early are cancelled and
+            # awaited, so none of them still uses the store or the workspace
+            for future in running:
+                future.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+            if store is not None:
+                store.close()
+            close_workspace(workspace)
+        print_summary()
+        export_metrics()
+        export_trace()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate SFT tasks by running their canonical and incorrect solutions")
+    parser.add_argument("input", help="JSONL file or JSON array of tasks")
+    parser.add_argument("output", help="JSONL file the results are written to")
+    parser.add_argument("--jobs", type=int, default=1, help="Tasks run in parallel (0 = one per CPU)")
+    parser.add_argument("--fsync-every", type=int, default=100, help="Results written between fsyncs")
+    parser.add_argument("--result-store", help="SQLite file used to skip tasks that already have results")
+    parser.add_argument("--artifact-cache", help="Directory of the compiled-artifact cache")
+    parser.add_argument("--cpu-limit", type=int, help="CPU seconds a solution run may use")
+    parser.add_argument("--memory-limit", type=int, help="Address space in bytes a solution run may use")
+    parser.add_argument("--no-pch", action="store_true", help="Do not precompile C++ headers")
+    parser.add_argument("--java-server", action="store_true",
+                        help="Run Java solutions in long-lived JVMs (experimental, smoke-tested at startup)")
+    parser.add_argument("--python-forkserver", action="store_true", help="Fork Python solutions from a warm interpreter")
+    parser.add_argument("--node-workers", action="store_true", help="Run JavaScript solutions in warm node workers")
+    parser.add_argument("--workspace", choices=("disk", "tmpfs"), default="disk",
+                        help="Build tasks in all_tasks/ or in a scratch dir on a tmpfs")
+    parser.add_argument("--workspace-root", help="tmpfs directory for the scratch dir (default /dev/shm)")
+    parser.add_argument("--output-limit", type=int, default=1 << 20,
+                        help="Bytes of stdout and of stderr kept per run (0 = no limit)")
+    parser.add_argument("--output-kill-limit", type=int, default=16 << 20,
+                        help="Bytes a solution run may print before it is killed (0 = no limit)")
+    parser.add_argument("--retain", choices=("all", "failures", "none"),
+                        help="Task directories kept in all_tasks/ (default: failures with --workspace tmpfs, else all)")
+    parser.add_argument("--metrics-file", help="OpenMetrics textfile written at the end of the run")
+    parser.add_argument("--metrics-json", help="JSON summary of the run's counters and stage latencies")
+    parser.add_argument("--trace", help="Chrome trace-event JSON of the run (Perfetto, chrome://tracing)")
+    parser.add_argument("--cpp-build-graph", action="store_true",
+                        help="Compile all C++ tasks up front in one parallel make build graph")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="Run every task's programs even when another task generates the same ones")
+    parser.add_argument("--preflight", choices=("off", "fast", "full"), default="fast",
+                        help="Checks run before any subprocess: fast = schema, tests and Python syntax, "
+                             "full = also batched g++/javac/node syntax checks")
+    parser.add_argument("--timing-runs", type=int, default=0,
+                        help="Timed runs of each solution for runtime profiling (0 = off; use with --jobs 1)")
+    parser.add_argument("--timing-warmup", type=int, default=1, help="Untimed runs before the timed ones")
+    parser.add_argument("--timing-cpu", type=int, help="CPU core the timed runs are pinned to")
+    parser.add_argument("--timing-ratio", type=float, default=2.0,
+                        help="Incorrect/canonical median runtime that flags a passing incorrect solution as just slow")
+    parser.add_argument("--timing-min-time", type=float, default=0.01,
+                        help="Seconds below which an incorrect solution's median is too noisy to flag")
+    args = parser.parse_args()
+
+    process_json_stream(
+        args.input, args.output, jobs=args.jobs, fsync_every=args.fsync_every,
+        result_store=args.result_store, artifact_cache=args.artifact_cache, cpp_pch=not args.no_pch, java_server=args.java_server,
+        python_forkserver=args.python_forkserver, node_workers=args.node_workers,
+        cpu_limit=args.cpu_limit, memory_limit=args.memory_limit,
+        workspace=args.workspace, workspace_root=args.workspace_root, retain=args.retain,
+        output_limit=args.output_limit or None, output_kill_limit=args.output_kill_limit or None,
+        metrics_file=args.metrics_file, metrics_json=args.metrics_json, trace_file=args.trace,
+        cpp_build_graph=args.cpp_build_graph, preflight=args.preflight, dedup=not args.no_dedup, timing_runs=args.timing_runs, timing_warmup=args.timing_warmup,
+        timing_cpu=args.timing_cpu, timing_ratio=args.timing_ratio, timing_min_time=args.timing_min_time,
+    )
+
+
+if __name__ == "__main__":
+    main()
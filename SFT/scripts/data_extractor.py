@@ -1,6 +1,84 @@
-import nbformat
+import argparse
+import hashlib
 import json
 import os
+import sqlite3
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+FIELDS = [
+    "task_id", "prompt", "canonical_solution", "incorrect_solution",
+    "entry_point", "test_setup", "test", "language", "difficulty", "domain", "description"
+]
+
+
+def extract_fields(cells):
+    """
+    Collects the filled-in values that follow the "### <field>" Markdown cells.
+
+    Args:
+        cells (list): Notebook cells as dicts with "cell_type" and "source".
+
+    Returns:
+        dict: Extracted field-value pairs (with formatting preserved).
+    """
+    data = {}
+    last_field = None
+
+    for cell in cells:
+        if cell["cell_type"] == "markdown":
+            content = cell["source"]  # Do NOT strip
+            if isinstance(content, list):
+                # Raw .ipynb files store the source as a list of lines
+                content = "".join(content)
+            if content.startswith("### ") and content[4:].strip() in FIELDS:
+                last_field = content[4:].strip()  # Strip only the field name
+            elif last_field and not content.startswith("# Put"):
+                data[last_field] = content  # Preserve full formatting
+                last_field = None
+
+    return data
+
+
+def read_notebook_cells(notebook_path):
+    """
+    Reads the cells of a notebook with a plain JSON parse, skipping nbformat's
+    schema validation. Notebooks older than format 4 are converted by nbformat,
+    which is only imported for them.
+
+    Args:
+        notebook_path (str): Full path to the notebook file.
+
+    Returns:
+        list: The notebook's cells.
+    """
+    with open(notebook_path, "rb") as f:
+        return parse_notebook_cells(f.read())
+
+
+def parse_notebook_cells(raw):
+    """
+    Parses the cells out of the bytes of a notebook file, like
+    read_notebook_cells.
+
+    Args:
+        raw (bytes): Contents of the notebook file.
+
+    Returns:
+        list: The notebook's cells.
+    """
+    nb = json.loads(raw.decode("utf-8"))
+    if not isinstance(nb, dict):
+        raise ValueError("notebook is not a JSON object")
+
+    if nb.get("nbformat", 0) < 4 or "cells" not in nb:
+        import nbformat
+
+        nb = nbformat.convert(nbformat.from_dict(nb), 4)
+
+    return nb["cells"]
+
 
 def extract_notebook_fields_from_path(notebook_path):
     """
@@ -21,25 +99,12 @@ def extract_notebook_fields_from_path(notebook_path):
     print(f"✅ Found notebook file at:\n{notebook_path}")
 
     # ✅ Read notebook
+    import nbformat
+
     with open(notebook_path, "r", encoding="utf-8") as f:
         nb = nbformat.read(f, as_version=4)
 
-    fields = [
-        "task_id", "prompt", "canonical_solution", "incorrect_solution",
-        "entry_point", "test_setup", "test", "language", "difficulty", "domain", "description"
-    ]
-
-    data = {}
-    last_field = None
-
-    for cell in nb["cells"]:
-        if cell["cell_type"] == "markdown":
-            content = cell["source"]  # Do NOT strip
-            if content.startswith("### ") and content[4:].strip() in fields:
-                last_field = content[4:].strip()  # Strip only the field name
-            elif last_field and not content.startswith("# Put"):
-                data[last_field] = content  # Preserve full formatting
-                last_field = None
+    data = extract_fields(nb["cells"])
 
     if data:
         print("✅ Extracted JSON:")
@@ -49,3 +114,204 @@ def extract_notebook_fields_from_path(notebook_path):
     else:
         print("⚠️ No filled fields found — did you fill them in yet?")
         return {}
+
+
+def find_notebooks(root):
+    """
+    Yields the paths of all notebooks under a directory in a stable order,
+    skipping Jupyter's checkpoint copies.
+
+    Args:
+        root (str): Directory to walk.
+    """
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(name for name in dirnames if name != ".ipynb_checkpoints")
+        for filename in sorted(filenames):
+            if filename.endswith(".ipynb"):
+                yield os.path.join(dirpath, filename)
+
+
+def _extract_quietly(notebook_path):
+    # Runs in a pool process: (path, fields, error message or None)
+    try:
+        return notebook_path, extract_fields(read_notebook_cells(notebook_path)), None
+    except (OSError, ValueError, KeyError, TypeError, ImportError) as e:
+        return notebook_path, {}, f"{type(e).__name__}: {e}"
+
+
+def extract_directory(root, out, jobs=None, chunksize=16):
+    """
+    Extracts the fields of every notebook under a directory, spread over a
+    process pool, and writes one JSON object per task to out as soon as it
+    is ready (in path order). Notebooks without filled fields are skipped.
+
+    Args:
+        root (str): Directory containing the task notebooks.
+        out (file): Text stream the JSONL lines are written to.
+        jobs (int): Worker processes, None for one per CPU.
+        chunksize (int): Notebooks handed to a worker at a time.
+
+    Returns:
+        tuple: (tasks written, notebooks without fields, notebooks that failed)
+    """
+    written = empty = failed = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for path, data, error in pool.map(_extract_quietly, find_notebooks(root), chunksize=chunksize):
+            if error:
+                print(f"❌ {path}: {error}", file=sys.stderr)
+                failed += 1
+            elif not data:
+                empty += 1
+            else:
+                out.write(json.dumps(data, ensure_ascii=False) + "\n")
+                written += 1
+    return written, empty, failed
+
+
+class ExtractionIndex:
+    """
+    Persistent SQLite map from each notebook's path (relative to the
+    extracted directory) to its size, mtime, content hash and extracted
+    fields, so a rebuild only parses the notebooks that changed.
+    """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS notebooks (path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, sha256 TEXT NOT NULL, fields TEXT, error TEXT)"
+        )
+
+    def entries(self):
+        """Returns {path: (size, mtime_ns, sha256)} of every indexed notebook."""
+        rows = self.db.execute("SELECT path, size, mtime_ns, sha256 FROM notebooks")
+        return {path: (size, mtime_ns, sha256) for path, size, mtime_ns, sha256 in rows}
+
+    def put(self, path, size, mtime_ns, sha256, fields=None, error=None):
+        self.db.execute(
+            "INSERT OR REPLACE INTO notebooks VALUES (?, ?, ?, ?, ?, ?)",
+            (path, size, mtime_ns, sha256, None if error else json.dumps(fields, ensure_ascii=False), error),
+        )
+
+    def touch(self, path, size, mtime_ns):
+        self.db.execute("UPDATE notebooks SET size = ?, mtime_ns = ? WHERE path = ?", (size, mtime_ns, path))
+
+    def remove(self, paths):
+        self.db.executemany("DELETE FROM notebooks WHERE path = ?", [(path,) for path in paths])
+
+    def export(self, out):
+        """Writes the fields of every notebook that has some as JSONL; returns the line count."""
+        written = 0
+        rows = self.db.execute("SELECT fields FROM notebooks WHERE fields IS NOT NULL ORDER BY path")
+        for (fields,) in rows:
+            if fields != "{}":
+                out.write(fields + "\n")
+                written += 1
+        return written
+
+    def close(self):
+        self.db.close()
+
+
+def _extract_if_changed(item):
+    # Runs in a pool process: (sha256, changed, fields, error message or None).
+    # A notebook whose content still matches known_sha256 is not parsed.
+    notebook_path, known_sha256 = item
+    try:
+        with open(notebook_path, "rb") as f:
+            raw = f.read()
+    except OSError as e:
+        return None, True, {}, f"{type(e).__name__}: {e}"
+    digest = hashlib.sha256(raw).hexdigest()
+    if digest == known_sha256:
+        return digest, False, None, None
+    try:
+        return digest, True, extract_fields(parse_notebook_cells(raw)), None
+    except (ValueError, KeyError, TypeError, ImportError) as e:
+        return digest, True, {}, f"{type(e).__name__}: {e}"
+
+
+def update_extraction_index(root, index_path, jobs=None, chunksize=16):
+    """
+    Brings the extraction index up to date with a directory of notebooks.
+    Notebooks whose size and mtime are unchanged are not opened; the others
+    are hashed and only re-parsed when their content changed. Notebooks that
+    no longer exist are dropped from the index.
+
+    Args:
+        root (str): Directory containing the task notebooks.
+        index_path (str): SQLite file holding the index.
+        jobs (int): Worker processes, None for one per CPU.
+        chunksize (int): Notebooks handed to a worker at a time.
+
+    Returns:
+        tuple: (ExtractionIndex, Counter of unchanged/extracted/failed/removed notebooks)
+    """
+    index = ExtractionIndex(index_path)
+    known = index.entries()
+    stats = Counter()
+    changed = []
+    seen = set()
+    for path in find_notebooks(root):
+        relpath = os.path.relpath(path, root)
+        seen.add(relpath)
+        stat = os.stat(path)
+        entry = known.get(relpath)
+        if entry and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+            stats["unchanged"] += 1
+        else:
+            changed.append((path, relpath, stat, entry[2] if entry else None))
+
+    with index.db:
+        removed = set(known) - seen
+        index.remove(removed)
+        stats["removed"] = len(removed)
+        if changed:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                items = [(path, sha256) for path, _, _, sha256 in changed]
+                results = pool.map(_extract_if_changed, items, chunksize=chunksize)
+                for (path, relpath, stat, _), (digest, modified, data, error) in zip(changed, results):
+                    if error:
+                        print(f"❌ {path}: {error}", file=sys.stderr)
+                        stats["failed"] += 1
+                    if digest is None:
+                        continue
+                    if not modified:
+                        index.touch(relpath, stat.st_size, stat.st_mtime_ns)
+                        stats["unchanged"] += 1
+                        continue
+                    index.put(relpath, stat.st_size, stat.st_mtime_ns, digest, data, error)
+                    if not error:
+                        stats["extracted"] += 1
+    return index, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract SFT tasks from a directory of notebooks as JSONL")
+    parser.add_argument("directory", help="Directory searched recursively for .ipynb files")
+    parser.add_argument("-o", "--output", help="JSONL file to write (default: stdout)")
+    parser.add_argument("--jobs", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--index", help="SQLite extraction index; only new or changed notebooks are parsed")
+    args = parser.parse_args()
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        if args.index:
+            index, stats = update_extraction_index(args.directory, args.index, args.jobs)
+            try:
+                written = index.export(out)
+            finally:
+                index.close()
+            print(f"✅ {written} tasks written; {stats['extracted']} notebooks extracted, "
+                  f"{stats['unchanged']} unchanged, {stats['removed']} removed, {stats['failed']} failed",
+                  file=sys.stderr)
+            return
+        written, empty, failed = extract_directory(args.directory, out, args.jobs)
+    finally:
+        if args.output:
+            out.close()
+    print(f"✅ {written} tasks extracted, {empty} notebooks without fields, {failed} failed", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
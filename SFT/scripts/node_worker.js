@@ -0,0 +1,155 @@
+// Node worker of warm_workers: runs one script per request in a fresh vm context
+//   RUN <output limit> <kill limit> <file> <timeout ms>
+// and answers with the WarmWorker status header and the script's output.
+
+const path = require('path');
+const readline = require('readline');
+const util = require('util');
+const vm = require('vm');
+const { Console } = require('console');
+const { Writable } = require('stream');
+const { createRequire } = require('module');
+
+class ExitSignal {
+  constructor(code) { this.code = code; }
+}
+
+let current = null;
+
+// Head + tail window of one stream, like the runner's OutputWindow
+function outputWindow(limit) {
+  return { limit, head: [], headSize: 0, tail: [], tailSize: 0, total: 0 };
+}
+
+function feed(window, chunk) {
+  window.total += chunk.length;
+  if (!window.limit) return window.head.push(chunk);
+  const room = Math.floor(window.limit / 2) - window.headSize;
+  if (room > 0) {
+    window.head.push(chunk.subarray(0, room));
+    window.headSize += Math.min(room, chunk.length);
+    chunk = chunk.subarray(room);
+  }
+  if (!chunk.length) return;
+  window.tail.push(chunk);
+  window.tailSize += chunk.length;
+  while (window.tailSize - window.tail[0].length >= window.limit - Math.floor(window.limit / 2)) {
+    window.tailSize -= window.tail.shift().length;
+  }
+}
+
+function contents(window) {
+  const head = Buffer.concat(window.head);
+  const tail = Buffer.concat(window.tail);
+  if (!window.limit || window.total <= window.limit) return Buffer.concat([head, tail]);
+  const kept = tail.subarray(tail.length - (window.limit - head.length));
+  const skipped = window.total - head.length - kept.length;
+  return Buffer.concat([head, Buffer.from(`\n... [${skipped} bytes truncated] ...\n`), kept]);
+}
+
+function sink(run, window) {
+  // Once the run printed more than the kill limit it is answered as KILLED;
+  // the runner then replaces this worker, which may still be busy
+  return new Writable({
+    write(chunk, encoding, callback) {
+      feed(window, chunk);
+      if (run.killLimit && run.out.total + run.err.total > run.killLimit) finish(run, 'KILLED');
+      callback();
+    },
+  });
+}
+
+// Same layout as node's uncaught exception report
+function describe(error, run) {
+  let arrow = '';
+  const stack = typeof (error && error.stack) === 'string' ? error.stack : '';
+  // Errors thrown straight from the script already carry node's arrow
+  const frame = !/^\S+:\d+\n/.test(stack) && stack.match(/\n\s+at .*?\(?([^\s()]+):(\d+):(\d+)\)?/);
+  if (frame && frame[1] === run.filename) {
+    const line = run.source.split('\n')[frame[2] - 1];
+    arrow = `${run.filename}:${frame[2]}\n${line}\n${' '.repeat(frame[3] - 1)}^\n\n`;
+  }
+  return `${arrow}${util.inspect(error)}\n\nNode.js ${process.version}\n`;
+}
+
+function finish(run, status) {
+  if (run.done) return;
+  run.done = true;
+  current = null;
+  clearTimeout(run.watchdog);
+  for (const timer of run.timers) clearTimeout(timer);
+  const payload = Buffer.concat([contents(run.out), contents(run.err)]);
+  process.stdout.write(`${status}\t${payload.length}\n`);
+  process.stdout.write(payload);
+}
+
+function fail(run, error) {
+  if (run.done) return;
+  if (error instanceof ExitSignal) return finish(run, error.code ? 'FAIL' : 'PASS');
+  if (error && error.code === 'ERR_SCRIPT_EXECUTION_TIMEOUT') return finish(run, 'TIMEOUT');
+  feed(run.err, Buffer.from(describe(error, run)));
+  finish(run, 'FAIL');
+}
+
+function settle(run) {
+  // Wait for the timers the solution scheduled, like node does before exiting
+  if (run.done) return;
+  if (run.timers.size) return setTimeout(() => settle(run), 1);
+  finish(run, run.process.exitCode ? 'FAIL' : 'PASS');
+}
+
+function sandbox(run) {
+  const guard = (fn, args) => {
+    if (run.done) return;
+    try { fn(...args); } catch (error) { fail(run, error); }
+  };
+  const timer = (schedule, once) => (fn, delay, ...args) => {
+    const handle = schedule(() => { if (once) run.timers.delete(handle); guard(fn, args); }, delay);
+    run.timers.add(handle);
+    return handle;
+  };
+  const clear = (handle) => { run.timers.delete(handle); clearTimeout(handle); };
+  const stdout = sink(run, run.out);
+  const stderr = sink(run, run.err);
+  run.process = Object.create(process, {
+    stdout: { value: stdout },
+    stderr: { value: stderr },
+    exit: { value: (code) => { throw new ExitSignal(code === undefined ? run.process.exitCode : code); } },
+  });
+  const module = { exports: {}, filename: run.filename, id: '.', loaded: false };
+  module.require = createRequire(run.filename);
+  return vm.createContext({
+    console: new Console({ stdout, stderr }), process: run.process, module, exports: module.exports,
+    require: module.require, __filename: run.filename, __dirname: path.dirname(run.filename),
+    setTimeout: timer(setTimeout, true), setInterval: timer(setInterval, false), clearTimeout: clear,
+    clearInterval: clear, setImmediate: timer((fn) => setImmediate(fn), true), clearImmediate: clear,
+    queueMicrotask, Buffer, URL, URLSearchParams, TextEncoder, TextDecoder,
+  });
+}
+
+function start(limit, killLimit, filename, timeout) {
+  const run = {
+    filename, source: '', out: outputWindow(limit), err: outputWindow(limit), killLimit, timers: new Set(), done: false,
+  };
+  current = run;
+  run.watchdog = setTimeout(() => finish(run, 'TIMEOUT'), timeout);
+  try {
+    run.source = require('fs').readFileSync(filename, 'utf8');
+    // The CommonJS wrapper sits on the first line so line numbers stay intact
+    const script = new vm.Script(
+      '(function (exports, require, module, __filename, __dirname) {' + run.source +
+      '\n}).call(module.exports, exports, require, module, __filename, __dirname);',
+      { filename });
+    script.runInContext(sandbox(run), { timeout });
+  } catch (error) {
+    return fail(run, error);
+  }
+  setImmediate(() => settle(run));
+}
+
+process.on('uncaughtException', (error) => { if (current) fail(current, error); });
+process.on('unhandledRejection', (error) => { if (current) fail(current, error); });
+readline.createInterface({ input: process.stdin }).on('line', (line) => {
+  const [, limit, killLimit, filename, timeout] = line.split('\t');
+  start(Number(limit), Number(killLimit), filename, Number(timeout));
+});
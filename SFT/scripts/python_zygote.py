@@ -0,0 +1,124 @@
+# Python zygote of warm_workers: forks one child per request
+#   RUN <output limit> <kill limit> <cwd> <path> <timeout s> <cpu limit s> <memory limit bytes>
+# and answers with the WarmWorker status header and the child's output.
+
+import atexit, os, resource, select, signal, sys, tempfile, time, traceback, types
+
+# Preloaded once here so that forked children start with them imported
+for _name in ("abc", "ast", "bisect", "collections", "copy", "dataclasses", "datetime",
+              "decimal", "enum", "fractions", "functools", "heapq", "itertools", "json",
+              "math", "operator", "random", "re", "statistics", "string", "typing", "unittest"):
+    try:
+        __import__(_name)
+    except ImportError:
+        pass
+
+
+def run_child(cwd, path, stdout, stderr, cpu_limit, memory_limit):
+    # Mirrors `python <path>`: fresh __main__, script directory on sys.path,
+    # and the runner's rlimits set before any of the solution runs
+    os.setsid()
+    if cpu_limit:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_limit + 1))
+    if memory_limit:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    os.chdir(cwd)
+    os.dup2(os.open(os.devnull, os.O_RDONLY), 0)
+    os.dup2(stdout.fileno(), 1)
+    os.dup2(stderr.fileno(), 2)
+    sys.stdin = open(os.devnull)
+    path = os.path.abspath(path)
+    sys.argv = [path]
+    sys.path[0] = os.path.dirname(path)
+    main = types.ModuleType("__main__")
+    main.__file__ = path
+    sys.modules["__main__"] = main
+
+    code = 0
+    try:
+        with open(path, "rb") as f:
+            exec(compile(f.read(), path, "exec"), main.__dict__)
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        kind, value, tb = sys.exc_info()
+        traceback.print_exception(kind, value, tb.tb_next)
+        code = 1
+    atexit._run_exitfuncs()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(code)
+
+
+def wait(pid, timeout, outputs, kill_limit):
+    # (exit status, rusage) of the child, or "TIMEOUT" / "KILLED" (printed
+    # more than kill_limit bytes) after killing it. The output files are
+    # checked every 10ms while a kill limit is set.
+    deadline = time.monotonic() + timeout
+    fd = os.pidfd_open(pid) if hasattr(os, "pidfd_open") else None
+    delay = 0.001
+    try:
+        while (remaining := deadline - time.monotonic()) > 0:
+            if fd is not None:
+                if select.select([fd], [], [], min(remaining, 0.01) if kill_limit else remaining)[0]:
+                    return os.wait4(pid, 0)[1:]
+            else:
+                done, status, rusage = os.wait4(pid, os.WNOHANG)
+                if done:
+                    return status, rusage
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 2, 0.01 if kill_limit else 0.05)
+            if kill_limit and sum(os.fstat(f.fileno()).st_size for f in outputs) > kill_limit:
+                result = "KILLED"
+                break
+        else:
+            result = "TIMEOUT"
+    finally:
+        if fd is not None:
+            os.close(fd)
+    os.killpg(pid, signal.SIGKILL)
+    os.waitpid(pid, 0)
+    return result
+
+
+def window(f, limit):
+    # First and last limit // 2 bytes of the file, like the runner's
+    # OutputWindow; the rest is never read
+    size = f.seek(0, os.SEEK_END)
+    f.seek(0)
+    if not limit or size <= limit:
+        return f.read()
+    head = f.read(limit // 2)
+    f.seek(size - (limit - limit // 2))
+    return head + f"\n... [{size - limit} bytes truncated] ...\n".encode() + f.read()
+
+
+protocol = sys.stdout.buffer
+for line in sys.stdin.buffer:
+    _, limit, kill_limit, cwd, path, timeout, cpu_limit, memory_limit = line.decode("utf-8").rstrip("\n").split("\t")
+    cpu_limit, memory_limit = int(cpu_limit), int(memory_limit)
+    with tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            run_child(cwd, path, stdout, stderr, cpu_limit, memory_limit)
+        status = wait(pid, float(timeout), (stdout, stderr), int(kill_limit))
+        output = window(stdout, int(limit)) + window(stderr, int(limit))
+    if isinstance(status, str):
+        result = status
+    else:
+        status, rusage = status
+        code = os.waitstatus_to_exitcode(status)
+        # Killed by RLIMIT_CPU: SIGXCPU at the soft limit, SIGKILL at the hard one
+        if cpu_limit and (code == -signal.SIGXCPU or code == -signal.SIGKILL
+                          and rusage.ru_utime + rusage.ru_stime >= cpu_limit):
+            result = "TIMEOUT"
+        else:
+            result = "PASS" if code == 0 else "FAIL"
+    protocol.write(f"{result}\t{len(output)}\n".encode("utf-8") + output)
+    protocol.flush()
@@ -0,0 +1,237 @@
+import contextlib
+import functools
+import hashlib
+import os
+import select
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+# The worker programs live next to this module and are read when a worker
+# starts: python_zygote.py, node_worker.js and SftJvmServer.java
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+PYTHON_ZYGOTE = os.path.join(SOURCE_DIR, "python_zygote.py")
+NODE_WORKER = os.path.join(SOURCE_DIR, "node_worker.js")
+JVM_SERVER = os.path.join(SOURCE_DIR, "SftJvmServer.java")
+
+JVM_COMPILE_TIMEOUT = 120
+
+
+class WarmWorker:
+    # A long-lived helper process speaking a line protocol on its stdin and
+    # stdout: one tab-separated request per line, answered by a
+    # "<status>\t<length>\n" header followed by <length> bytes of output.
+    # The second and third field of every request are the output limit and
+    # the kill limit (0 for none); the worker keeps the same head + tail
+    # window of each stream as the runner's OutputWindow and answers KILLED
+    # once a run printed more than the kill limit.
+
+    def __init__(self, command):
+        self.pid = os.getpid()
+        self.proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL)
+        self.buffer = b""
+
+    def alive(self):
+        return self.pid == os.getpid() and self.proc.poll() is None
+
+    def request(self, fields, timeout, output_limit=0, kill_limit=0):
+        # Returns (status, output), or None when the worker died or stopped
+        # answering; the worker is shut down in that case
+        deadline = time.monotonic() + timeout
+        fields = fields[:1] + [str(output_limit), str(kill_limit)] + fields[1:]
+        try:
+            self.proc.stdin.write(("\t".join(fields) + "\n").encode("utf-8"))
+            self.proc.stdin.flush()
+            while b"\n" not in self.buffer:
+                self._fill(deadline)
+            header, self.buffer = self.buffer.split(b"\n", 1)
+            status, length = header.decode("utf-8").rsplit("\t", 1)
+            length = int(length)
+            if output_limit and length > 2 * (output_limit + 64):
+                # Two windows and their truncation notes at most
+                raise ValueError("worker answer exceeds the output limit")
+            while len(self.buffer) < length:
+                self._fill(deadline)
+        except (OSError, ValueError):
+            self.close()
+            return None
+        payload, self.buffer = self.buffer[:length], self.buffer[length:]
+        return status, payload.decode("utf-8", "replace")
+
+    def _fill(self, deadline):
+        fd = self.proc.stdout.fileno()
+        if not select.select([fd], [], [], max(0, deadline - time.monotonic()))[0]:
+            raise TimeoutError("worker stopped answering")
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            raise ConnectionError("worker exited")
+        self.buffer += chunk
+
+    def close(self):
+        if self.pid != os.getpid():
+            return
+        if self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
+        # Recycled workers would otherwise leak both pipes
+        for pipe in (self.proc.stdin, self.proc.stdout):
+            with contextlib.suppress(OSError):
+                pipe.close()
+
+
+class WorkerPool:
+    # Idle WarmWorkers of one kind, grown on demand up to the number of
+    # concurrent callers. Workers inherited through fork() are never reused.
+
+    def __init__(self, factory, recycle_on=()):
+        self.factory = factory
+        self.recycle_on = recycle_on
+        self.idle = []
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+
+    def request(self, fields, timeout, output_limit=0, kill_limit=0):
+        with self.lock:
+            if self.pid != os.getpid():
+                self.idle, self.pid = [], os.getpid()
+            worker = self.idle.pop() if self.idle else None
+        if worker is None or not worker.alive():
+            worker = self.factory()
+            if worker is None:
+                return None
+
+        result = worker.request(fields, timeout, output_limit, kill_limit)
+        if result is None or result[0] in self.recycle_on:
+            worker.close()
+        else:
+            with self.lock:
+                self.idle.append(worker)
+        return result
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for worker in idle:
+            worker.close()
+
+
+def worker_run_result(result):
+    # (status, output) of a solution run answered by a warm worker, or None
+    # when the caller should fall back to a fresh process
+    if result is None or result[0] not in ("PASS", "FAIL", "TIMEOUT", "KILLED"):
+        return None
+    if result[0] == "TIMEOUT":
+        return "TIMEOUT", "Execution timed out."
+    if result[0] == "KILLED":
+        # Reported like a cold run that the runner's _read_pipes killed
+        return "FAIL", result[1] + "\nOutput limit exceeded, process killed.\n"
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def jvm_server_classpath():
+    # The server class is compiled once per source and javac version
+    try:
+        version = subprocess.run(["javac", "-version"], capture_output=True, text=True)
+    except OSError:
+        return None
+    with open(JVM_SERVER, "rb") as f:
+        source = f.read()
+    key = hashlib.sha256(source + (version.stdout + version.stderr).encode("utf-8")).hexdigest()[:16]
+    classpath = os.path.join(tempfile.gettempdir(), "sft_runner_jvm", key)
+    if not os.path.exists(os.path.join(classpath, "SftJvmServer.class")):
+        os.makedirs(os.path.dirname(classpath), exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".tmp-", dir=os.path.dirname(classpath))
+        shutil.copy(JVM_SERVER, staging)
+        try:
+            returncode = subprocess.run(["javac", "SftJvmServer.java"], cwd=staging, capture_output=True,
+                                        timeout=JVM_COMPILE_TIMEOUT).returncode
+        except (OSError, subprocess.TimeoutExpired):
+            returncode = 1
+        if returncode != 0:
+            shutil.rmtree(staging, ignore_errors=True)
+            return None
+        try:
+            os.rename(staging, classpath)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+    return classpath
+
+
+JVM_SMOKE_SOURCE = """public class Smoke {
+    public static void main(String[] args) {
+        System.out.println("ok");
+        System.err.println("err");
+    }
+}
+"""
+
+
+_jvm_smoke_lock = threading.Lock()
+
+
+def jvm_server_works():
+    # The JVM server is experimental: before any task uses it, a fresh
+    # server has to compile and run a trivial class with the output a plain
+    # java run gives. Checked once per process.
+    with _jvm_smoke_lock:
+        return _jvm_smoke_test()
+
+
+@functools.lru_cache(maxsize=None)
+def _jvm_smoke_test():
+    classpath = jvm_server_classpath()
+    works = False
+    worker = None
+    try:
+        if classpath is not None:
+            worker = WarmWorker(["java", "-cp", classpath, "SftJvmServer"])
+            with tempfile.TemporaryDirectory(prefix="sft_jvm_smoke_") as folder:
+                with open(os.path.join(folder, "Smoke.java"), "w") as f:
+                    f.write(JVM_SMOKE_SOURCE)
+                compiled = worker.request(["COMPILE", folder, "Smoke.java"], JVM_COMPILE_TIMEOUT)
+                if compiled is not None and compiled[0] == "OK":
+                    works = worker.request(["RUN", folder, "Smoke", "10000"], 20) == ("PASS", "ok\nerr\n")
+    except OSError:
+        works = False
+    finally:
+        if worker is not None:
+            worker.close()
+    if not works:
+        print("⚠️ The JVM server failed its smoke test, running Java solutions in plain JVMs")
+    return works
+
+
+def start_jvm_server():
+    if not jvm_server_works():
+        return None
+    return WarmWorker(["java", "-cp", jvm_server_classpath(), "SftJvmServer"])
+
+
+def start_python_zygote():
+    return WarmWorker(["python", PYTHON_ZYGOTE])
+
+
+def start_node_worker():
+    return WarmWorker(["node", NODE_WORKER])
+
+
+# (factory, answers after which the worker is replaced): the JVM and node
+# workers cannot stop a runaway solution, so they are killed instead
+WORKER_KINDS = {
+    "java": (start_jvm_server, ("TIMEOUT", "KILLED")),
+    "python": (start_python_zygote, ()),
+    "node": (start_node_worker, ("TIMEOUT", "KILLED")),
+}
+
+_worker_pools = {}
+
+
+def worker_pool(kind):
+    if kind not in _worker_pools:
+        factory, recycle_on = WORKER_KINDS[kind]
+        _worker_pools[kind] = WorkerPool(factory, recycle_on)
+    return _worker_pools[kind]
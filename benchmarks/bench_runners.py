@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+# Throughput benchmark for the test runners. Generates synthetic tasks,
+# runs every runner mode in its own child process and writes tasks/sec,
+# p50/p95 per-task latency and peak memory to a JSON file that can be
+# compared against a stored baseline. Needs no network access; modes whose
+# toolchain is missing are reported as skipped.
+import os
+import sys
+import ast
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import importlib.util
+import subprocess
+from collections import Counter
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SFT_RUNNER = os.path.join(ROOT, "SFT", "scripts", "all_test_runner_sft.py")
+PYTHON_RUNNER = os.path.join(ROOT, "test runners", "python", "script.py")
+JAVA_RUNNER = os.path.join(ROOT, "test runners", "java", "windows" if os.name == "nt" else "mac", "run_tests.py")
+
+TOOLCHAINS = {
+    "Python": ("python",),
+    "C++": ("g++",),
+    "Java": ("javac", "java"),
+    "JavaScript": ("node",),
+}
+
+# Runner settings of every all_test_runner_sft.py mode; jobs=None means --jobs
+SFT_MODES = {
+    "sft-serial": {"jobs": 1},
+    "sft-pool": {"jobs": None},
+    "sft-cache": {"jobs": None, "artifact_cache": "artifact_cache"},
+    "sft-warm": {"jobs": None, "java_server": True, "python_forkserver": True, "node_workers": True},
+    "sft-tmpfs": {"jobs": None, "workspace": "tmpfs", "retain": "failures"},
+    "sft-async": {"jobs": None, "async": True},
+}
+MODES = list(SFT_MODES) + ["python-script", "java-gradle"]
+
+# Share of generated tasks whose incorrect solution never terminates or
+# does not compile; the rest simply fail their tests
+KIND_WEIGHTS = {"fail": 8, "loop": 1, "error": 1}
+
+
+def available_languages():
+    return [language for language, tools in TOOLCHAINS.items() if all(shutil.which(tool) for tool in tools)]
+
+
+def python_task(task_id, kind, size):
+    body = ["total = 0", "for value in values:", "    total += value"]
+    body += [f"total += 0 * {i}" for i in range(size)]
+    incorrect = {
+        "fail": body + ["return total + 1"],
+        "loop": ["while True:", "    pass"],
+        "error": body + ["return total +"],
+    }[kind]
+    return {
+        "task_id": task_id, "language": "Python", "entry_point": "total_sum",
+        "prompt": "def total_sum(values):",
+        "canonical_solution": "\n".join(body + ["return total"]),
+        "incorrect_solution": "\n".join(incorrect),
+        "test": repr([f"assert total_sum({list(range(i))}) == {sum(range(i))}" for i in range(1, size + 2)]),
+    }
+
+
+def cpp_task(task_id, kind, size):
+    body = ["    int total = 0;", "    for (int value : values) total += value;"]
+    body += [f"    total += 0 * {i};" for i in range(size)]
+    incorrect = {
+        "fail": body + ["    return total + 1;"],
+        # volatile keeps the compiler from removing the side-effect free loop
+        "loop": ["    volatile int spin = 0;", "    while (true) spin++;"],
+        "error": body + ["    return total"],
+    }[kind]
+    signature = "int total_sum(vector<int> values) {"
+    return {
+        "task_id": task_id, "language": "C++", "entry_point": "total_sum",
+        "prompt": "#include <vector>\n// Sum of the values",
+        "canonical_solution": "\n".join([signature] + body + ["    return total;", "}"]),
+        "incorrect_solution": "\n".join([signature] + incorrect + ["}"]),
+        "test": repr([f"assert(total_sum({{{', '.join(map(str, range(i)))}}}) == {sum(range(i))});"
+                      for i in range(1, size + 2)]),
+    }
+
+
+def java_task(task_id, kind, size):
+    classname = "Bench" + "".join(c for c in task_id if c.isalnum())
+    body = ["    int total = 0;", "    for (int value : values) total += value;"]
+    body += [f"    total += 0 * {i};" for i in range(size)]
+    incorrect = {
+        "fail": body + ["    return total + 1;"],
+        "loop": ["    while (true) { }"],
+        "error": body + ["    return total"],
+    }[kind]
+    signature = "public static int totalSum(int[] values) {"
+    return {
+        "task_id": task_id, "language": "Java", "entry_point": f"{classname}:totalSum",
+        "prompt": f"public class {classname} {{",
+        "canonical_solution": "\n".join([signature] + body + ["    return total;", "}"]),
+        "incorrect_solution": "\n".join([signature] + incorrect + ["}"]),
+        "test": repr([f"assert totalSum(new int[]{{{', '.join(map(str, range(i)))}}}) == {sum(range(i))};"
+                      for i in range(1, size + 2)]),
+    }
+
+
+def js_task(task_id, kind, size):
+    body = ["  let total = 0;", "  for (const value of values) total += value;"]
+    body += [f"  total += 0 * {i};" for i in range(size)]
+    incorrect = {
+        "fail": body + ["  return total + 1;"],
+        "loop": ["  while (true) {}"],
+        "error": body + ["  return total +;"],
+    }[kind]
+    signature = "function totalSum(values) {"
+    return {
+        "task_id": task_id, "language": "JavaScript", "entry_point": "totalSum",
+        "prompt": "// Sum of the values",
+        "canonical_solution": "\n".join([signature] + body + ["  return total;", "}"]),
+        "incorrect_solution": "\n".join([signature] + incorrect + ["}"]),
+        "test": repr([f"assert.strictEqual(totalSum({list(range(i))}), {sum(range(i))});"
+                      for i in range(1, size + 2)]),
+    }
+
+
+GENERATORS = {"Python": python_task, "C++": cpp_task, "Java": java_task, "JavaScript": js_task}
+
+
+def generate_tasks(count, languages, seed=0, max_size=50):
+    # Deterministic mix of languages, task kinds and sizes (size = lines of
+    # filler in the solutions and number of test cases)
+    rng = random.Random(seed)
+    kinds = [kind for kind, weight in KIND_WEIGHTS.items() for _ in range(weight)]
+    tasks = []
+    for n in range(count):
+        language = languages[n % len(languages)]
+        kind = rng.choice(kinds)
+        size = rng.randint(1, max_size)
+        tasks.append(GENERATORS[language](f"bench_{n}_{kind}", kind, size))
+    return tasks
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def task_latency(result):
+    # Compile + run wall time of the slower of the two solutions, which the
+    # runner evaluates concurrently. Only meaningful while every task runs
+    # its own programs: a result shared through dedup or the result store
+    # has no stage timings, so run_sft_mode turns both off.
+    latencies = []
+    for prefix in ("ir", "incs"):
+        usage = result.get(f"{prefix}_test_resources", {})
+        latencies.append(sum(stage.get("wall_time", 0) for stage in usage.values() if isinstance(stage, dict)))
+    return max(latencies)
+
+
+def run_sft_mode(mode, tasks, jobs, run_timeout):
+    import asyncio
+
+    # Imported by name so pool workers can unpickle the runner's functions
+    sys.path.insert(0, os.path.dirname(SFT_RUNNER))
+    import all_test_runner_sft as runner
+
+    runner.RUN_TIMEOUT = run_timeout
+    # Each task compiles and runs its own programs, so task_latency sees
+    # every stage; duplicate generated programs would otherwise be shared
+    settings = {"dedup": False, "result_store": None, **SFT_MODES[mode]}
+    use_async = settings.pop("async", False)
+    settings["jobs"] = settings["jobs"] or jobs
+    if use_async:
+        settings.pop("jobs")
+
+        async def collect():
+            return [result async for result in runner.process_json_async(json.dumps(tasks), **settings)]
+
+        results = asyncio.run(collect())
+    else:
+        results = runner.process_json(json.dumps(tasks), **settings)
+    return ([task_latency(result) for result in results],
+            Counter(f"{result.get('ir_test_status')}/{result.get('incs_test_status')}" for result in results))
+
+
+def python_candidates(count, seed):
+    # test.py plus count candidate scripts for script.py; infinite loops are
+    # left out because script.py has no timeout
+    task = python_task("candidate", "fail", 10)
+    rng = random.Random(seed)
+    tests = ["from solution import *", ""]
+    for n, case in enumerate(ast.literal_eval(task["test"])):
+        tests += [f"def test_{n}():", f"    {case}", ""]
+    files = {"test.py": "\n".join(tests)}
+    # A correct solution.py left in the folder must not be what the
+    # candidates are tested against
+    files["solution.py"] = task["prompt"] + "\n" + "\n".join(
+        "    " + line for line in task["canonical_solution"].splitlines()) + "\n"
+    for n in range(count):
+        kind = rng.choice(["pass", "pass", "fail", "error"])
+        if kind == "pass":
+            body = task["canonical_solution"]
+        else:
+            body = python_task("candidate", kind, 10)["incorrect_solution"]
+        files[f"candidate_{n}_{kind}.py"] = task["prompt"] + "\n" + "\n".join(
+            "    " + line for line in body.splitlines()) + "\n"
+    return files
+
+
+def run_python_script_mode(count, seed):
+    os.makedirs("src")
+    for name, source in python_candidates(count, seed).items():
+        with open(os.path.join("src", name), "w") as f:
+            f.write(source)
+    script = load_module("python_script_runner", PYTHON_RUNNER)
+    latencies = []
+    statuses = Counter()
+    process_script = script.process_script
+
+    def timed(script_path, *args, **kwargs):
+        start = time.monotonic()
+        totals = process_script(script_path, *args, **kwargs)
+        latencies.append(time.monotonic() - start)
+        statuses["reported"] += 1
+        return totals
+
+    script.process_script = timed
+    sys.argv = [PYTHON_RUNNER, "src"]
+    script.main()
+    check_python_reports("src")
+    return latencies, statuses
+
+
+def check_python_reports(folder):
+    # Every failing or broken candidate has to be reported as such
+    wrong = []
+    for name in os.listdir(folder):
+        kind = name[:-len(".py")].rpartition("_")[2]
+        if not name.startswith("candidate_") or kind == "pass":
+            continue
+        report = os.path.join(folder, "test_reports", name[:-len(".py")] + "_report.txt")
+        with open(report) as f:
+            text = f.read()
+        if " failed" not in text and " error" not in text:
+            wrong.append(name)
+    if wrong:
+        raise RuntimeError(f"script.py reported failing candidates as passing: {', '.join(sorted(wrong))}")
+
+
+def java_candidates(count, seed):
+    rng = random.Random(seed)
+    body = "int total = 0;\n        for (int value : values) total += value;\n        return total{};"
+    files = {"test/SolutionTest.java": "\n".join([
+        "import org.junit.jupiter.api.Test;",
+        "import static org.junit.jupiter.api.Assertions.assertEquals;",
+        "",
+        "public class SolutionTest {",
+        "    @Test",
+        "    public void sums() {",
+        "        assertEquals(6, Solution.totalSum(new int[]{1, 2, 3}));",
+        "    }",
+        "}",
+        "",
+    ])}
+    for n in range(count):
+        kind = rng.choice(["pass", "pass", "fail", "error"])
+        ending = {"pass": "", "fail": " + 1", "error": " +"}[kind]
+        files[f"code/Candidate{n}.java"] = "\n".join([
+            f"public class Candidate{n} {{",
+            "    public static int totalSum(int[] values) {",
+            "        " + body.format(ending),
+            "    }",
+            "}",
+            "",
+        ])
+    return files
+
+
+def run_java_gradle_mode(count, seed):
+    for name, source in java_candidates(count, seed).items():
+        os.makedirs(os.path.dirname(name), exist_ok=True)
+        with open(name, "w") as f:
+            f.write(source)
+    runner = load_module("java_test_runner", JAVA_RUNNER)
+    latencies = []
+    statuses = Counter()
+    save_test_result = runner.save_test_result
+    last = [time.monotonic()]
+
+    def timed(test_result):
+        save_test_result(test_result)
+        now = time.monotonic()
+        latencies.append(now - last[0])
+        last[0] = now
+        statuses[test_result.status] += 1
+
+    runner.save_test_result = timed
+    runner.main()
+    return latencies, statuses
+
+
+def skip_reason(mode, languages):
+    if mode in SFT_MODES:
+        return None if languages else "no toolchain for any task language"
+    if mode == "python-script":
+        missing = [name for name in ("pytest", "coverage") if importlib.util.find_spec(name) is None]
+        return f"missing Python packages: {', '.join(missing)}" if missing else None
+    if mode == "java-gradle":
+        missing = [tool for tool in ("gradle", "javac", "java") if not shutil.which(tool)]
+        if missing:
+            return f"missing tools: {', '.join(missing)}"
+        # run_tests.py resolves JUnit through Gradle; offline that only works
+        # with a populated Gradle cache
+        if not os.path.isdir(os.path.join(os.path.expanduser("~"), ".gradle", "caches")):
+            return "no local Gradle cache to resolve JUnit offline"
+    return None
+
+
+def child_main(args):
+    # Runs one mode inside its own process and working directory and writes
+    # the raw measurements to args.metrics
+    with open(args.task_file) as f:
+        tasks = json.load(f)
+    os.chdir(args.workdir)
+    log = open("runner.log", "w")
+    sys.stdout = log
+    start = time.monotonic()
+    if args.mode in SFT_MODES:
+        latencies, statuses = run_sft_mode(args.mode, tasks, args.jobs, args.run_timeout)
+    elif args.mode == "python-script":
+        latencies, statuses = run_python_script_mode(args.candidates, args.seed)
+    else:
+        latencies, statuses = run_java_gradle_mode(args.candidates, args.seed)
+    elapsed = time.monotonic() - start
+    sys.stdout = sys.__stdout__
+    log.close()
+    with open(args.metrics, "w") as f:
+        json.dump({"elapsed": elapsed, "latencies": latencies, "statuses": statuses}, f)
+
+
+def run_mode(mode, args, tasks_path, scratch):
+    workdir = os.path.join(scratch, mode)
+    os.makedirs(workdir)
+    metrics_path = os.path.join(workdir, "metrics.json")
+    command = [sys.executable, os.path.abspath(__file__), "--child", mode, "--workdir", workdir,
+               "--task-file", tasks_path, "--metrics", metrics_path, "--jobs", str(args.jobs),
+               "--run-timeout", str(args.run_timeout), "--candidates", str(args.candidates),
+               "--seed", str(args.seed)]
+    proc = subprocess.Popen(command)
+    # wait4's ru_maxrss is the largest resident set of any single process
+    # among the child and the descendants it waited for, not the sum of
+    # the tree at any moment
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        return {"error": f"exited with {proc.returncode}, see {os.path.join(workdir, 'runner.log')}"}
+    with open(metrics_path) as f:
+        metrics = json.load(f)
+
+    latencies = metrics["latencies"]
+    max_rss_kb = rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+    return {
+        "tasks": len(latencies),
+        "elapsed": round(metrics["elapsed"], 3),
+        "tasks_per_sec": round(len(latencies) / metrics["elapsed"], 3) if metrics["elapsed"] else None,
+        "p50_latency": round(percentile(latencies, 0.50), 4) if latencies else None,
+        "p95_latency": round(percentile(latencies, 0.95), 4) if latencies else None,
+        "max_rss_kb": max_rss_kb,
+        "statuses": metrics["statuses"],
+    }
+
+
+def compare(results, baseline, tolerance):
+    # Prints the change of every mode against the baseline and returns the
+    # modes that got slower than tolerance allows
+    regressions = []
+    if baseline.get("config") != results["config"]:
+        print("\n⚠️ The baseline was measured with a different configuration")
+    print(f"\n{'mode':<15} {'tasks/s':>18} {'p95 latency':>20} {'max process RSS (KiB)':>22}")
+    for mode, current in results["modes"].items():
+        previous = baseline.get("modes", {}).get(mode)
+        if not previous or "tasks_per_sec" not in previous or "tasks_per_sec" not in current:
+            continue
+        cells = []
+        for field in ("tasks_per_sec", "p95_latency", "max_rss_kb"):
+            old, new = previous.get(field), current.get(field)
+            change = f"{(new - old) / old:+.1%}" if old and new is not None else "n/a"
+            cells.append(f"{old} -> {new} ({change})")
+        print(f"{mode:<15} " + "  ".join(cells))
+        # Either side is None when a mode had nothing to measure
+        old, new = previous["tasks_per_sec"], current["tasks_per_sec"]
+        if old and new is not None and new < old * (1 - tolerance):
+            regressions.append(mode)
+            continue
+        old, new = previous.get("p95_latency"), current.get("p95_latency")
+        if old and new is not None and new > old * (1 + tolerance):
+            regressions.append(mode)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the throughput of the test runners")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"Comma-separated modes ({', '.join(MODES)})")
+    parser.add_argument("--tasks", type=int, default=40, help="Synthetic tasks per all_test_runner_sft.py mode")
+    parser.add_argument("--candidates", type=int, default=8, help="Candidate files for script.py / run_tests.py")
+    parser.add_argument("--languages", help="Comma-separated task languages (default: every installed one)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Parallelism of the pooled modes")
+    parser.add_argument("--run-timeout", type=float, default=1, help="Seconds before a solution run times out")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the task generator")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file the results are written to")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed slowdown before a mode regresses")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory of every mode")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--metrics", help=argparse.SUPPRESS)
+    parser.add_argument("--task-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        args.mode = args.child
+        child_main(args)
+        return
+
+    languages = args.languages.split(",") if args.languages else available_languages()
+    unknown = [language for language in languages if language not in GENERATORS]
+    if unknown:
+        parser.error(f"unknown languages: {', '.join(unknown)}")
+    modes = args.modes.split(",")
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(unknown)}")
+
+    scratch = os.path.abspath(f"bench_scratch_{os.getpid()}")
+    os.makedirs(scratch)
+    tasks_path = os.path.join(scratch, "tasks.json")
+    with open(tasks_path, "w") as f:
+        json.dump(generate_tasks(args.tasks, languages, args.seed), f)
+
+    results = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {"tasks": args.tasks, "candidates": args.candidates, "languages": languages,
+                   "jobs": args.jobs, "run_timeout": args.run_timeout, "seed": args.seed},
+        "modes": {},
+    }
+    try:
+        for mode in modes:
+            reason = skip_reason(mode, languages)
+            if reason:
+                print(f"⏭️  {mode}: skipped ({reason})")
+                results["modes"][mode] = {"skipped": reason}
+                continue
+            print(f"⏱️  {mode} ...", flush=True)
+            results["modes"][mode] = run_mode(mode, args, tasks_path, scratch)
+            print(f"   {results['modes'][mode]}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n❌ Slower than the baseline: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,26 @@
 #!/usr/bin/env python3
 import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import re
 import sys
 import subprocess
 import os
 import shutil
-from typing import List, Tuple
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional
+
+# Loading and reporting coverage data is done one script at a time
+COVERAGE_LOCK = threading.Lock()
+
+# Chrome trace events recorded while --trace is given, None otherwise
+TRACE_EVENTS: Optional[List[dict]] = None
 
 
 def setup_parser() -> argparse.ArgumentParser:
@@ -20,9 +36,59 @@ def setup_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Show complete test log instead of summary",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Number of scripts tested concurrently (0 = one per CPU)",
+    )
+    parser.add_argument(
+        "--single-session",
+        action="store_true",
+        help="Test every script in one pytest session instead of one per script",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Write a Chrome trace-event timeline of the run to FILE",
+    )
     return parser
 
 
+@contextlib.contextmanager
+def _record_span(name: str, args: dict) -> Iterator[None]:
+    start = time.monotonic_ns()
+    try:
+        yield
+    finally:
+        TRACE_EVENTS.append(
+            {
+                "name": name,
+                "cat": "script",
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": (time.monotonic_ns() - start) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_native_id(),
+                "args": args,
+            }
+        )
+
+
+def trace_span(name: str, **args):
+    """Time a step of the run as a trace event; a no-op unless tracing."""
+    if TRACE_EVENTS is None:
+        return contextlib.nullcontext()
+    return _record_span(name, args)
+
+
+def write_trace(path: str) -> None:
+    """Write the recorded events in the trace-event JSON format."""
+    with open(path, "w") as f:
+        json.dump({"traceEvents": TRACE_EVENTS, "displayTimeUnit": "ms"}, f)
+
+
 def get_python_files(folder: str) -> List[str]:
     """Get all Python files in the folder except test.py and solution.py."""
     files = []
@@ -39,50 +105,182 @@ def create_report_folder(folder: str) -> str:
     return report_folder
 
 
-def run_tests_with_coverage(
-    script_path: str, test_path: str, verbose: bool
-) -> Tuple[bool, str, str]:
+def display_path(path: str) -> str:
+    """Path as coverage and pytest print it: relative to the cwd when inside it."""
+    path = os.path.abspath(path)
+    cwd = os.path.join(os.getcwd(), "")
+    return path[len(cwd):] if path.startswith(cwd) else path
+
+
+def relocate_output(text: str, staged_dir: str, folder: str) -> str:
+    """
+    Replace the staging directory in tool output with the script folder, so
+    reports read as if solution.py had been tested inside the folder.
     """
-    Run pytest with coverage on the specified files.
+    text = text.replace(os.path.abspath(staged_dir), os.path.abspath(folder))
+    return text.replace(display_path(staged_dir), display_path(folder))
+
+
+def relocate_coverage_report(report: str, staged_dir: str, folder: str) -> str:
+    """
+    relocate_output for the table of `coverage report`, which names files
+    like display_path and has its name column resized to the new names.
+    """
+    return rename_coverage_report(
+        report, lambda name: name.replace(display_path(staged_dir), display_path(folder))
+    )
+
+
+def rename_coverage_report(report: str, relocate: Callable[[str], str]) -> str:
+    """Rename the files of a `coverage report` table, resizing its name column."""
+    lines = report.split("\n")
+    rows = [re.match(r"(.*?\S)( {2,})(\S.*)$", line) for line in lines]
+    names = [row.group(1) for row in rows if row]
+    if not names:
+        return relocate(report)
+    shift = max(len(relocate(name)) for name in names) - max(len(name) for name in names)
+    for i, (line, row) in enumerate(zip(lines, rows)):
+        if row:
+            name = relocate(row.group(1))
+            padding = len(row.group(1)) + len(row.group(2)) - len(name) + shift
+            lines[i] = name + " " * max(1, padding) + row.group(3)
+        elif line and set(line) == {"-"}:
+            lines[i] = "-" * (len(line) + shift)
+    return "\n".join(lines)
+
+
+def run_tests_with_coverage(script_path: str, test_path: str, verbose: bool) -> str:
+    """
+    Run pytest with coverage on the specified files and return its output,
+    stderr (e.g. coverage or import errors) after stdout.
     """
     script_dir = os.path.dirname(script_path)
 
-    # Add script directory to PYTHONPATH
+    # Add script directory to PYTHONPATH and keep the coverage data next to
+    # the script, so concurrent runs do not share a .coverage file
     env = os.environ.copy()
+    search_path = f"{script_dir}:{os.path.dirname(os.path.abspath(test_path))}"
     if "PYTHONPATH" in env:
-        env["PYTHONPATH"] = f"{script_dir}:{env['PYTHONPATH']}"
+        env["PYTHONPATH"] = f"{search_path}:{env['PYTHONPATH']}"
     else:
-        env["PYTHONPATH"] = script_dir
+        env["PYTHONPATH"] = search_path
+    env["COVERAGE_FILE"] = coverage_data_file(script_path)
+    # sys.monitoring measures with much less overhead than a trace function
+    if sys.version_info >= (3, 12):
+        env.setdefault("COVERAGE_CORE", "sysmon")
 
     # Configure pytest arguments based on verbosity
     pytest_args = ["-v", "--color=yes"]
+    # pytest would otherwise put the test folder first on sys.path, where a
+    # stray solution.py shadows the staged one; with importlib it stays off
+    # sys.path and comes after the staged directory through PYTHONPATH
+    pytest_args.append("--import-mode=importlib")
     if not verbose:
         pytest_args.extend(["--tb=no", "-ra"])
 
-    # Run tests with coverage
-    try:
+    # Run tests with coverage; failing tests are reported, not raised
+    with trace_span("pytest", script=os.path.basename(script_path)):
         test_output = subprocess.run(
-            ["coverage", "run", "-m", "pytest", test_path] + pytest_args,
+            [sys.executable, "-m", "coverage", "run", "-m", "pytest", test_path]
+            + pytest_args,
             capture_output=True,
             text=True,
             check=False,
             env=env,
         )
-    except subprocess.CalledProcessError as e:
-        return False, "", f"Error running tests: {str(e)}"
 
-    # Generate coverage report
-    try:
-        coverage_output = subprocess.run(
-            ["coverage", "report", "-m"], capture_output=True, text=True, check=False
-        )
-    except subprocess.CalledProcessError as e:
-        return False, test_output.stdout, f"Error generating coverage report: {str(e)}"
+    return test_output.stdout + test_output.stderr
 
-    return True, test_output.stdout, coverage_output.stdout
 
+def coverage_data_file(script_path: str) -> str:
+    """The coverage data file of a staged script, unique to that script."""
+    return os.path.join(os.path.dirname(script_path), ".coverage")
 
-import re
+
+def load_coverage(data_file: Optional[str]):
+    """A Coverage object for data_file, or an empty in-memory one if None."""
+    import coverage
+
+    cov = coverage.Coverage(data_file=data_file)
+    # Pick sys.monitoring on Python 3.12+ unless a core is configured
+    if sys.version_info >= (3, 12):
+        try:
+            if cov.get_option("run:core") is None:
+                cov.set_option("run:core", "sysmon")
+        except coverage.CoverageException:  # coverage without the option
+            pass
+    if data_file is not None:
+        cov.load()
+    return cov
+
+
+def coverage_report(cov) -> str:
+    """`coverage report -m` for the data of cov, generated in-process."""
+    import coverage
+
+    output = io.StringIO()
+    with COVERAGE_LOCK:
+        try:
+            cov.report(file=output, show_missing=True)
+        except coverage.CoverageException as e:
+            output.write(f"{e}\n")
+    return output.getvalue()
+
+
+def coverage_totals(cov, script_name: str, solution_path: str, test_path: str) -> dict:
+    """
+    Statements and missed statements of the solution, and the test.py lines
+    that ran, for the combined summary.
+    """
+    import coverage
+
+    totals = {"script": script_name, "solution": None, "test": None}
+    with COVERAGE_LOCK:
+        for key, path in (("solution", solution_path), ("test", test_path)):
+            try:
+                _, statements, _, missing, _ = cov.analysis2(path)
+            except coverage.CoverageException:
+                continue
+            totals[key] = (set(statements), set(statements) - set(missing))
+    return totals
+
+
+def percent(covered: int, total: int) -> str:
+    return f"{100 * covered // total}%" if total else "100%"
+
+
+def write_coverage_summary(report_folder: str, summaries: List[dict]) -> str:
+    """Write the cross-script coverage summary and return its path."""
+    width = max([len("Script")] + [len(summary["script"]) for summary in summaries])
+    header = f"{'Script':<{width}}   Stmts   Miss  Cover   test.py"
+    lines = ["Coverage Summary", "=" * 50, "", header, "-" * len(header)]
+    test_statements, test_run = set(), set()
+    for summary in sorted(summaries, key=lambda summary: summary["script"]):
+        row = f"{summary['script']:<{width}}"
+        if summary["solution"] is None:
+            row += f"{'-':>8}{'-':>7}{'-':>7}"
+        else:
+            statements, run = summary["solution"]
+            row += f"{len(statements):>8}{len(statements) - len(run):>7}"
+            row += f"{percent(len(run), len(statements)):>7}"
+        if summary["test"] is None:
+            row += f"{'-':>10}"
+        else:
+            statements, run = summary["test"]
+            test_statements |= statements
+            test_run |= run
+            row += f"{percent(len(run), len(statements)):>10}"
+        lines.append(row)
+    lines.append("-" * len(header))
+    lines.append(
+        f"test.py statements run by any script: {len(test_run)} of "
+        f"{len(test_statements)} ({percent(len(test_run), len(test_statements))})"
+    )
+
+    summary_path = os.path.join(report_folder, "coverage_summary.txt")
+    with open(summary_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return summary_path
 
 
 def strip_ansi_codes(text: str) -> str:
@@ -93,25 +291,41 @@ def strip_ansi_codes(text: str) -> str:
 
 def process_script(
     script_path: str, folder: str, report_folder: str, verbose: bool
-) -> None:
-    """Process a single script file."""
+) -> dict:
+    """Process a single script file and return its coverage totals."""
     print(f"\nProcessing: {os.path.basename(script_path)}")
 
-    # Create solution.py with script contents
-    solution_path = os.path.join(folder, "solution.py")
-    shutil.copy2(script_path, solution_path)
-
-    # Run tests
-    test_path = os.path.join(folder, "test.py")
-    success, test_output, coverage_output = run_tests_with_coverage(
-        solution_path, test_path, verbose
-    )
+    # Stage the script as solution.py in a directory of its own; test.py is
+    # run in place and imports it through PYTHONPATH
+    with tempfile.TemporaryDirectory(prefix="script_") as staged_dir:
+        solution_path = os.path.join(staged_dir, "solution.py")
+        shutil.copy2(script_path, solution_path)
+
+        # Run tests
+        test_path = os.path.join(folder, "test.py")
+        test_output = run_tests_with_coverage(solution_path, test_path, verbose)
+        test_output = relocate_output(test_output, staged_dir, folder)
+
+        # Report on the coverage data while the staged solution still exists
+        script_name = os.path.splitext(os.path.basename(script_path))[0]
+        with trace_span("coverage report", script=os.path.basename(script_path)):
+            cov = load_coverage(coverage_data_file(solution_path))
+            coverage_output = coverage_report(cov)
+            totals = coverage_totals(cov, script_name, solution_path, test_path)
+        coverage_output = relocate_coverage_report(coverage_output, staged_dir, folder)
 
     # Generate report
-    script_name = os.path.splitext(os.path.basename(script_path))[0]
-    report_path = os.path.join(report_folder, f"{script_name}_report.txt")
+    report_path = write_report(report_folder, script_name, test_output, coverage_output)
+    print(f"Report generated: {os.path.basename(report_path)}")
+    return totals
+
 
-    with open(report_path, "w") as f:
+def write_report(
+    report_folder: str, script_name: str, test_output: str, coverage_output: str
+) -> str:
+    """Write the report of one script and return its path."""
+    report_path = os.path.join(report_folder, f"{script_name}_report.txt")
+    with trace_span("write report", script=script_name), open(report_path, "w") as f:
         f.write(f"Test Report for {script_name}\n")
         f.write("=" * 50 + "\n\n")
         f.write("TEST RESULTS:\n")
@@ -120,15 +334,243 @@ def process_script(
         f.write("\nCOVERAGE REPORT:\n")
         f.write("-" * 20 + "\n")
         f.write(strip_ansi_codes(coverage_output))
+    return report_path
+
+
+class Candidate:
+    """A script tested in the shared pytest session, with its own coverage."""
+
+    def __init__(self, script_path: str) -> None:
+        self.script_path = script_path
+        self.name = os.path.splitext(os.path.basename(script_path))[0]
+        self.module = None
+        self.collect_error = None
+        self.collected = 0
+        self.reports = []
+        # Coverage is kept in memory and only switched on while this
+        # script is imported or its tests run
+        self.coverage = load_coverage(None)
+        omit = list(self.coverage.get_option("run:omit") or [])
+        self.coverage.set_option("run:omit", omit + [os.path.abspath(__file__)])
+        self.coverage.set_option("run:disable_warnings", ["no-data-collected"])
+
+    def contained(self, error: BaseException, when: str) -> Exception:
+        """The exception a session-ending error of this script is reported as."""
+        return RuntimeError(f"{self.name} raised {error!r} {when}")
+
+    @contextlib.contextmanager
+    def active(self) -> Iterator[None]:
+        """Make this script the `solution` module, importing it on first use."""
+        __tracebackhide__ = True
+        previous = sys.modules.get("solution")
+        self.coverage.start()
+        try:
+            if self.module is None:
+                spec = importlib.util.spec_from_file_location("solution", self.script_path)
+                module = importlib.util.module_from_spec(spec)
+                sys.modules["solution"] = module
+                try:
+                    spec.loader.exec_module(module)
+                except (Exception, KeyboardInterrupt):
+                    raise
+                except BaseException as e:
+                    # sys.exit() and the like would end the whole session;
+                    # they only fail this script's collection
+                    raise self.contained(e, "on import") from e
+                self.module = module
+            sys.modules["solution"] = self.module
+            yield
+        finally:
+            self.coverage.stop()
+            if previous is None:
+                sys.modules.pop("solution", None)
+            else:
+                sys.modules["solution"] = previous
+
+
+def session_plugin(candidates: List[Candidate], test_path: str):
+    """
+    Build the pytest plugin that collects test.py once per candidate. Each
+    copy of the test module is imported, and each of its tests is run, with
+    sys.modules["solution"] swapped to that candidate.
+    """
+    import pytest
+
+    class CandidateModule(pytest.Module):
+        candidate: Candidate
+
+        def _getobj(self):
+            __tracebackhide__ = True
+            with self.candidate.active():
+                # Import test.py afresh rather than reuse the previous copy
+                for name, module in list(sys.modules.items()):
+                    if getattr(module, "__file__", None) == str(self.path):
+                        del sys.modules[name]
+                return super()._getobj()
+
+    class CandidateFile(pytest.File):
+        def collect(self):
+            for candidate in candidates:
+                module = CandidateModule.from_parent(
+                    self,
+                    path=self.path,
+                    name=candidate.name,
+                    nodeid=f"{self.nodeid}::{candidate.name}",
+                )
+                module.candidate = candidate
+                yield module
+
+    class SessionPlugin:
+        def __init__(self) -> None:
+            self.by_name = {candidate.name: candidate for candidate in candidates}
+            self.current = None
+
+        @pytest.hookimpl(tryfirst=True)
+        def pytest_pycollect_makemodule(self, module_path, parent):
+            if os.path.samefile(module_path, test_path):
+                return CandidateFile.from_parent(parent, path=module_path)
+            return None
+
+        def pytest_collection_modifyitems(self, items) -> None:
+            for item in items:
+                item.getparent(CandidateModule).candidate.collected += 1
+
+        def pytest_collectreport(self, report) -> None:
+            name = report.nodeid.rpartition("::")[2]
+            if report.failed and name in self.by_name:
+                self.by_name[name].collect_error = report
+
+        @pytest.hookimpl(hookwrapper=True)
+        def pytest_runtest_protocol(self, item, nextitem):
+            self.current = item.getparent(CandidateModule).candidate
+            with self.current.active():
+                yield
+
+        @pytest.hookimpl(hookwrapper=True)
+        def pytest_pyfunc_call(self, pyfuncitem):
+            outcome = yield
+            error = outcome.excinfo[1] if outcome.excinfo else None
+            if error is not None and not isinstance(error, (Exception, KeyboardInterrupt)):
+                outcome.force_exception(self.current.contained(error, "in a test"))
+
+        def pytest_runtest_logreport(self, report) -> None:
+            self.current.reports.append(report)
+
+    return SessionPlugin()
+
+
+def session_header(output: str) -> List[str]:
+    """The lines pytest printed at the start of the session, up to the collection count."""
+    header = []
+    for line in strip_ansi_codes(output).splitlines():
+        header.append(line)
+        if line.startswith("collecting"):
+            break
+    return header
+
+
+def plural(count: int, noun: str) -> str:
+    return f"{count} {noun}{'' if count == 1 else 's'}"
+
+
+def session_test_output(candidate: Candidate, verbose: bool, header: List[str]) -> str:
+    """
+    Summarize a candidate's share of the session like `pytest -v -ra`, under
+    the session header with the candidate's own collection count.
+    """
+    results, summary, failures = [], [], []
+    counts = Counter()
+    duration = 0.0
+    reports = list(candidate.reports)
+    if candidate.collect_error is not None:
+        reports.insert(0, candidate.collect_error)
+    for report in reports:
+        duration += getattr(report, "duration", 0.0)
+        nodeid = report.nodeid.replace(f"::{candidate.name}", "", 1)
+        when = getattr(report, "when", "collect")
+        if when == "call" or (when == "setup" and report.skipped):
+            outcome = report.outcome
+        elif report.failed:
+            outcome = "error"
+        else:
+            continue
+        counts[outcome] += 1
+        word = outcome.upper()
+        if when != "collect":
+            line = f"{nodeid} {word}"
+            progress = f" [{100 * (len(results) + 1) // max(1, candidate.collected):3d}%]"
+            results.append(line + progress.rjust(80 - len(line) - 1))
+        if report.failed:
+            crash = getattr(report.longrepr, "reprcrash", None)
+            message = crash.message.splitlines()[0] if crash and crash.message else ""
+            short = f" - {message}" if message and when != "collect" else ""
+            summary.append(f"{word} {nodeid}{short}")
+            failures.append(f" {nodeid} ".center(80, "_") + "\n" + report.longreprtext)
+
+    collected = plural(candidate.collected, "item")
+    if candidate.collect_error is not None:
+        collected += " / 1 error"
+    lines = list(header)
+    if lines:
+        lines[-1] = re.sub(r"collected .*", f"collected {collected}", lines[-1])
+        lines.append("")
+    if results:
+        lines += results + [""]
+    if verbose and failures:
+        lines += [" FAILURES ".center(80, "=")] + failures
+    if summary:
+        lines += [" short test summary info ".center(80, "=")] + summary
+    if candidate.collect_error is not None:
+        lines.append(" Interrupted: 1 error during collection ".center(80, "!"))
+    totals = ", ".join(f"{n} {outcome}" for outcome, n in sorted(counts.items())) or "no tests ran"
+    lines.append(f" {totals} in {duration:.2f}s ".center(80, "="))
+    return "\n".join(lines) + "\n"
+
+
+def run_single_session(
+    python_files: List[str], folder: str, report_folder: str, verbose: bool
+) -> List[dict]:
+    """
+    Test every script in one pytest session, write the usual reports and
+    return the scripts' coverage totals.
+    """
+    import pytest
 
-    # Clean up
-    try:
-        os.remove(solution_path)
-        os.remove(".coverage")  # Remove coverage data file
-    except:
-        pass
-
-    print(f"Report generated: {os.path.basename(report_path)}")
+    print(f"\nTesting {len(python_files)} scripts in one pytest session")
+    candidates = [Candidate(script_path) for script_path in python_files]
+    test_path = os.path.join(folder, "test.py")
+    # The terminal output is only kept for its session header, which every
+    # report starts with like the reports of separate pytest runs
+    output = io.StringIO()
+    with trace_span("pytest session", scripts=len(candidates)), contextlib.redirect_stdout(output):
+        pytest.main(
+            [test_path, "-v", "--continue-on-collection-errors"],
+            plugins=[session_plugin(candidates, test_path)],
+        )
+    header = session_header(output.getvalue())
+
+    # Reports name the script solution.py, as test.py imports it
+    solution_name = display_path(os.path.join(folder, "solution.py"))
+    summaries = []
+    for candidate in candidates:
+        script_name = display_path(candidate.script_path)
+        coverage_output = rename_coverage_report(
+            coverage_report(candidate.coverage),
+            lambda name: solution_name if name == script_name else name,
+        )
+        report_path = write_report(
+            report_folder,
+            candidate.name,
+            session_test_output(candidate, verbose, header),
+            coverage_output,
+        )
+        print(f"Report generated: {os.path.basename(report_path)}")
+        summaries.append(
+            coverage_totals(
+                candidate.coverage, candidate.name, candidate.script_path, test_path
+            )
+        )
+    return summaries
 
 
 def main():
@@ -136,6 +578,9 @@ def main():
     parser = setup_parser()
     args = parser.parse_args()
 
+    if args.single_session and args.jobs != 1:
+        parser.error("--jobs cannot be used with --single-session")
+
     # Validate folder
     if not os.path.isdir(args.folder):
         print(f"Error: '{args.folder}' is not a valid directory")
@@ -155,11 +600,31 @@ def main():
     # Create reports folder
     report_folder = create_report_folder(args.folder)
 
-    # Process each script
-    for script_path in python_files:
-        process_script(script_path, args.folder, report_folder, args.verbose)
+    global TRACE_EVENTS
+    if args.trace:
+        TRACE_EVENTS = []
+
+    def run_candidate(script_path: str) -> dict:
+        with trace_span("candidate", script=os.path.basename(script_path)):
+            return process_script(script_path, args.folder, report_folder, args.verbose)
 
+    if args.single_session:
+        summaries = run_single_session(
+            python_files, args.folder, report_folder, args.verbose
+        )
+    else:
+        # Process each script; every one is staged separately, so they can
+        # run side by side
+        jobs = args.jobs or os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            summaries = list(pool.map(run_candidate, python_files))
+
+    summary_path = write_coverage_summary(report_folder, summaries)
+    print(f"\nCoverage summary: {os.path.basename(summary_path)}")
     print(f"\nAll reports generated in: {report_folder}")
+    if args.trace:
+        write_trace(args.trace)
+        print(f"Trace written to: {args.trace}")
 
 
 if __name__ == "__main__":
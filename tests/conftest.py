@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "SFT", "scripts"), os.path.join(ROOT, "test runners", "python")]
+
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    # all_test_runner_sft with its settings restored after the test and the
+    # task directories created under tmp_path
+    import all_test_runner_sft
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(all_test_runner_sft, "SETTINGS", dict(all_test_runner_sft.SETTINGS))
+    return all_test_runner_sft
@@ -0,0 +1,30 @@
+import asyncio
+
+
+def sleeping_task(task_id, seconds):
+    return {
+        "task_id": task_id,
+        "language": "Python",
+        "prompt": "import time\ndef f(n):",
+        "canonical_solution": f"time.sleep({seconds})\nreturn n",
+        "incorrect_solution": f"time.sleep({seconds})\nreturn n + 1",
+        "test": "['assert f(1) == 1']",
+    }
+
+
+def test_closing_the_stream_cancels_shared_programs_cleanly(runner):
+    # b and c share both programs, so c waits on the runs b owns when the
+    # stream is closed after the first result
+    tasks = [sleeping_task("a", 0), sleeping_task("b", 2), {**sleeping_task("b", 2), "task_id": "c"}]
+    errors = []
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        stream = runner.process_json_async(tasks, preflight="off", retain="none")
+        async for result in stream:
+            assert result["task_id"] == "a"
+            break
+        await stream.aclose()
+
+    asyncio.run(main())
+    assert errors == []
@@ -0,0 +1,34 @@
+import io
+import json
+
+import pytest
+
+import data_extractor
+
+
+def write_notebook(path, task_id):
+    cells = [{"cell_type": "markdown", "source": ["### task_id"]},
+             {"cell_type": "markdown", "source": [task_id]}]
+    path.write_text(json.dumps({"nbformat": 4, "nbformat_minor": 5, "metadata": {}, "cells": cells}))
+
+
+@pytest.mark.parametrize("content", ["[]", "null", '"cells"'])
+def test_non_object_notebook_is_a_value_error(content):
+    with pytest.raises(ValueError, match="not a JSON object"):
+        data_extractor.parse_notebook_cells(content.encode())
+
+
+def test_malformed_notebook_does_not_abort_the_batch(tmp_path):
+    write_notebook(tmp_path / "a.ipynb", "a")
+    (tmp_path / "b.ipynb").write_text("[]")
+    write_notebook(tmp_path / "c.ipynb", "c")
+
+    out = io.StringIO()
+    assert data_extractor.extract_directory(str(tmp_path), out, jobs=1) == (2, 0, 1)
+    assert [json.loads(line)["task_id"] for line in out.getvalue().splitlines()] == ["a", "c"]
+
+    index, stats = data_extractor.update_extraction_index(str(tmp_path), str(tmp_path / "index.db"), jobs=1)
+    try:
+        assert stats["extracted"] == 2 and stats["failed"] == 1
+    finally:
+        index.close()
@@ -0,0 +1,32 @@
+import tracemalloc
+
+
+def printing_tasks(count, size=200_000):
+    # Distinct Python tasks whose programs both print size bytes
+    for n in range(count):
+        yield {
+            "task_id": f"task_{n}",
+            "language": "Python",
+            "prompt": "def f(n):",
+            "canonical_solution": f"print('{n}' + 'x' * {size})\nreturn n",
+            "incorrect_solution": f"print('{n}' + 'x' * {size})\nreturn n + 1",
+            "test": "['assert f(1) == 1']",
+        }
+
+
+def streamed_peak(runner, count):
+    tracemalloc.start()
+    try:
+        for result in runner.run_tasks(printing_tasks(count)):
+            assert result["ir_test_status"] == "PASS"
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_dedup_keeps_streaming_memory_flat(runner, monkeypatch):
+    monkeypatch.setattr(runner, "DEDUP_CACHE_BYTES", 1 << 20)
+    runner.configure(dedup=True, retain="none", preflight="off")
+    few, many = streamed_peak(runner, 10), streamed_peak(runner, 40)
+    # Keeping every finished task would add about 12 MB for the extra 30
+    assert many - few < 2 << 20
@@ -0,0 +1,26 @@
+import pytest
+
+SPIN = "while True:\n    pass\n"
+
+
+@pytest.mark.parametrize("forkserver", [False, True])
+def test_cpu_limit_kill_is_a_timeout(runner, tmp_path, forkserver):
+    (tmp_path / "spin.py").write_text(SPIN)
+    runner.configure(cpu_limit=1, python_forkserver=forkserver)
+    try:
+        assert runner.run_python_file("spin.py", {}) == ("TIMEOUT", "Execution timed out.")
+    finally:
+        runner.worker_pool("python").close()
+
+
+def test_memory_limit_applies_to_zygote_children(runner, tmp_path):
+    (tmp_path / "big.py").write_text("x = bytearray(800_000_000)\nprint('allocated')\n")
+    runner.configure(memory_limit=300_000_000, python_forkserver=True)
+    try:
+        usage = {}
+        status, output = runner.run_python_file("big.py", usage)
+    finally:
+        runner.worker_pool("python").close()
+    assert usage["run"]["worker"] == "python"
+    assert status == "FAIL" and "MemoryError" in output
+    assert usage["run"]["max_rss_kb"] is None
@@ -0,0 +1,45 @@
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "test runners", "python", "script.py")
+
+pytest.importorskip("coverage")
+
+
+def reports(folder, *options):
+    subprocess.run([sys.executable, SCRIPT, "py", *options], cwd=folder, check=True, capture_output=True)
+    report_folder = folder / "py" / "test_reports"
+    texts = {}
+    for path in sorted(report_folder.iterdir()):
+        texts[path.name] = re.sub(r" in \d+\.\d+s ", " in Xs ", path.read_text())
+        path.unlink()
+    return texts
+
+
+def test_single_session_reports_match_separate_runs(tmp_path):
+    folder = tmp_path / "py"
+    folder.mkdir()
+    (folder / "test.py").write_text(
+        "from solution import add\n\n\ndef test_one():\n    assert add(1, 2) == 3\n\n\n"
+        "def test_two():\n    assert add(2, 2) == 4\n"
+    )
+    (folder / "good.py").write_text("def add(a, b):\n    return a + b\n")
+    (folder / "bad.py").write_text("def add(a, b):\n    if a == 2:\n        return 5\n    return a + b\n")
+
+    separate = reports(tmp_path)
+    session = reports(tmp_path, "--single-session")
+    assert session == separate
+    assert "test session starts" in session["bad_report.txt"]
+    assert "py/solution.py" in session["bad_report.txt"]
+
+
+def test_single_session_rejects_jobs(tmp_path):
+    result = subprocess.run([sys.executable, SCRIPT, str(tmp_path), "--single-session", "--jobs", "2"],
+                            capture_output=True, text=True)
+    assert result.returncode == 2
+    assert "--jobs cannot be used with --single-session" in result.stderr
@@ -0,0 +1,45 @@
+import asyncio
+import json
+
+import pytest
+
+TASK = {
+    "task_id": "t",
+    "language": "Python",
+    "prompt": "def f(n):",
+    "canonical_solution": "return n",
+    "incorrect_solution": "return n + 1",
+    "test": "['assert f(1) == 1']",
+}
+
+
+def test_process_json_settings_only_apply_to_the_call(runner):
+    before = dict(runner.SETTINGS)
+    [result] = runner.process_json(json.dumps([TASK]), preflight="off", retain="none", dedup=False)
+    assert result["ir_test_status"] == "PASS"
+    assert runner.SETTINGS == before
+
+    with pytest.raises(json.JSONDecodeError):
+        runner.process_json("not json", retain="none")
+    assert runner.SETTINGS == before
+
+
+def test_process_json_async_settings_only_apply_to_the_call(runner):
+    before = dict(runner.SETTINGS)
+
+    async def main():
+        stream = runner.process_json_async([TASK], preflight="off", retain="none")
+        results = [result async for result in stream]
+        assert runner.SETTINGS == before
+        return results
+
+    [result] = asyncio.run(main())
+    assert result["incs_test_status"] == "FAIL"
+    assert runner.SETTINGS == before
+
+
+@pytest.mark.parametrize("name", ["python_forkserver", "node_workers", "java_server"])
+def test_warm_worker_settings_are_part_of_the_result_key(runner, name):
+    cold = runner.result_key(TASK)
+    runner.configure(**{name: True})
+    assert runner.result_key(TASK) != cold
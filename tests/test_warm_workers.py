@@ -0,0 +1,59 @@
+import shutil
+
+import pytest
+
+import warm_workers
+
+JAVA_PROGRAMS = {
+    "Pass": 'System.out.println("hello");\nSystem.err.println("world");',
+    "Fail": "assert 1 + 1 == 3;",
+    "Exit": "System.exit(3);",
+}
+
+
+def java_source(classname, body):
+    return f"public class {classname} {{\n    public static void main(String[] args) {{\n        {body}\n    }}\n}}\n"
+
+
+@pytest.fixture
+def pools():
+    yield
+    for pool in warm_workers._worker_pools.values():
+        pool.close()
+
+
+@pytest.mark.skipif(not (shutil.which("javac") and shutil.which("java")), reason="needs a JDK")
+def test_jvm_server_matches_plain_java(runner, tmp_path, pools):
+    assert warm_workers.jvm_server_works()
+    for classname, body in JAVA_PROGRAMS.items():
+        for java_server in (False, True):
+            folder = tmp_path / f"{classname}-{java_server}"
+            folder.mkdir()
+            (folder / f"{classname}.java").write_text(java_source(classname, body))
+            runner.configure(java_server=java_server)
+            usage = {}
+            result = runner.run_java_file(str(folder / f"{classname}.java"), usage)
+            if not java_server:
+                cold = result
+                continue
+            assert result[0] == cold[0]
+            assert usage["compile"].get("worker") == "java"
+            if classname == "Pass":
+                assert result == cold == ("PASS", "hello\nworld\n")
+                assert usage["run"]["worker"] == "java"
+            elif classname == "Exit":
+                # System.exit takes the JVM down; the run is repeated in a plain java
+                assert "worker" not in usage["run"]
+
+
+def test_python_zygote_and_node_worker_start_from_their_sources(runner, tmp_path, pools):
+    (tmp_path / "a.py").write_text("import sys\nprint('out')\nsys.exit('err')\n")
+    (tmp_path / "a.js").write_text("console.log('out');\nconsole.error('err');\n")
+    runner.configure(python_forkserver=True, node_workers=True)
+
+    usage = {}
+    assert runner.run_python_file("a.py", usage) == ("FAIL", "out\nerr\n")
+    assert usage["run"]["worker"] == "python"
+    usage = {}
+    assert runner.run_js_file("a.js", usage) == ("PASS", "out\nerr\n")
+    assert usage["run"]["worker"] == "node"